@@ -0,0 +1,195 @@
+"""Local referee to play the Ultimate TicTacToe bots against each other.
+
+Usage: python arena.py <bot_a> <bot_b> [--games N] [--jobs N] [--turn-ms MS]
+A bot is a python file of this directory (run with this interpreter) or a
+command line. Both bots get the Codingame protocol on stdin: the opponent move
+("-1 -1" on the first turn), the number of valid actions and one "row col"
+line per valid action, and answer with a "row col" line. A bot that answers
+late, answers an invalid move or exits loses the game.
+"""
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from math import sqrt
+import os
+import select
+import shlex
+import subprocess
+import sys
+import time
+
+try:
+    from . import bot_gold
+except ImportError: # run as a script
+    import bot_gold
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+FIRST_TURN_MS = 1000
+TURN_MS = 100
+
+GameResult = namedtuple('GameResult', ['winner', 'reason', 'latencies', 'plies'])
+
+def bot_command(bot: str) -> list[str]:
+    """Command line for a bot file of this directory, or a shell style command."""
+    path = os.path.join(DIRECTORY, bot)
+    if bot.endswith(".py") and os.path.exists(path):
+        return [sys.executable, path]
+    return shlex.split(bot)
+
+class BotProcess():
+    """A bot subprocess answering one line per turn."""
+    def __init__(self, command: list[str]) -> None:
+        self.process = subprocess.Popen(
+            command, cwd=DIRECTORY, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        self.buffer = b""
+
+    def ask(self, lines: list[str], timeout: float) -> tuple[str, float]:
+        """Send the turn input, then wait for the answer line.
+        Returns the answer and the response time in seconds. Raises TimeoutError
+        when no line came within timeout, EOFError when the bot exited.
+
+        """
+        begin = time.perf_counter()
+        try:
+            self.process.stdin.write("".join(f"{line}\n" for line in lines).encode())
+            self.process.stdin.flush()
+        except BrokenPipeError as error:
+            raise EOFError from error
+
+        end = begin + timeout
+        output = self.process.stdout.fileno()
+        while b"\n" not in self.buffer:
+            remaining = end - time.perf_counter()
+            if remaining <= 0 or not select.select([output], [], [], remaining)[0]:
+                raise TimeoutError
+            chunk = os.read(output, 4096)
+            if not chunk:
+                raise EOFError
+            self.buffer += chunk
+        line, _, self.buffer = self.buffer.partition(b"\n")
+        return line.decode().strip(), time.perf_counter() - begin
+
+    def close(self) -> None:
+        """Stop the bot."""
+        self.process.kill()
+        self.process.wait()
+
+def game_winner(state: tuple) -> int:
+    """Winner of a finished game: 0 for player 1, 1 for player 2, None for a draw.
+    Without a line of boards the player who won the most boards wins.
+
+    """
+    macro_1, macro_2 = state[0] >> 81, state[1] >> 81
+    if bot_gold.HAS_WON[macro_1]:
+        return 0
+    if bot_gold.HAS_WON[macro_2]:
+        return 1
+    boards_1, boards_2 = macro_1.bit_count(), macro_2.bit_count()
+    if boards_1 == boards_2:
+        return None
+    return 0 if boards_1 > boards_2 else 1
+
+def play_game(commands: list[list[str]], first_turn_ms: int = FIRST_TURN_MS,
+              turn_ms: int = TURN_MS) -> GameResult:
+    """Play one game, commands[0] moving first.
+    The winner is the index of the command, the latencies are seconds per turn.
+
+    """
+    bots = [BotProcess(command) for command in commands]
+    latencies = ([], [])
+    state = (0, 0, None, False)
+    opponent = "-1 -1"
+    player = 0
+    try:
+        while True:
+            macro_1, macro_2 = state[0] >> 81, state[1] >> 81
+            moves = [] if bot_gold.IS_TERMINAL[macro_1 << 9 | macro_2] \
+                else bot_gold.get_valid_moves(state)
+            if not moves:
+                return GameResult(game_winner(state), "end", latencies, sum(map(len, latencies)))
+
+            actions = sorted(bot_gold.CELL_TO_STRING[move] for move in moves)
+            timeout = (turn_ms if latencies[player] else first_turn_ms) / 1000
+            try:
+                answer, latency = bots[player].ask([opponent, str(len(actions)), *actions],
+                                                   timeout)
+            except TimeoutError:
+                return GameResult(1 - player, "timeout", latencies, sum(map(len, latencies)))
+            except EOFError:
+                return GameResult(1 - player, "crash", latencies, sum(map(len, latencies)))
+            latencies[player].append(latency)
+            if answer not in actions:
+                return GameResult(1 - player, "invalid", latencies, sum(map(len, latencies)))
+
+            state = bot_gold.next_state(state, bot_gold.STRING_TO_CELL[answer])
+            opponent = answer
+            player = 1 - player
+    finally:
+        for bot in bots:
+            bot.close()
+
+def play_match(bot_a: str, bot_b: str, games: int, jobs: int,
+               first_turn_ms: int = FIRST_TURN_MS, turn_ms: int = TURN_MS) -> list[GameResult]:
+    """Play games between two bots, alternating who moves first.
+    The winners and latencies of the results are indexed as (bot_a, bot_b).
+
+    """
+    commands = [bot_command(bot_a), bot_command(bot_b)]
+    def play(game: int) -> GameResult:
+        # bot_a moves first in the even games
+        if game % 2 == 0:
+            return play_game(commands, first_turn_ms, turn_ms)
+        result = play_game(commands[::-1], first_turn_ms, turn_ms)
+        winner = None if result.winner is None else 1 - result.winner
+        return result._replace(winner=winner, latencies=result.latencies[::-1])
+
+    # a game only runs one of its bots at a time, a thread waits on it
+    with ThreadPoolExecutor(jobs) as executor:
+        return list(executor.map(play, range(games)))
+
+def score_interval(results: list[GameResult], z: float = 1.96) -> tuple[float, float]:
+    """Score of the first bot (a win is 1, a draw 1/2) and its confidence half width."""
+    scores = [1.0 if result.winner == 0 else .5 if result.winner is None else 0.0
+              for result in results]
+    mean = sum(scores) / len(scores)
+    variance = sum((score - mean) ** 2 for score in scores) / max(1, len(scores) - 1)
+    return mean, z * sqrt(variance / len(scores))
+
+def report(bot_a: str, bot_b: str, results: list[GameResult]) -> None:
+    """Print the outcome of a match."""
+    wins = sum(result.winner == 0 for result in results)
+    losses = sum(result.winner == 1 for result in results)
+    score, width = score_interval(results)
+    print(f"{bot_a} vs {bot_b}: {len(results)} games, "
+          f"W {wins} D {len(results) - wins - losses} L {losses}")
+    print(f"{bot_a} score {score:.3f} +- {width:.3f} (95%)")
+    print(f"{'bot':<16}{'timeouts':>9}{'crashes':>9}{'invalid':>9}"
+          f"{'first ms':>10}{'mean ms':>9}{'max ms':>8}")
+    for index, bot in enumerate((bot_a, bot_b)):
+        lost = [result.reason for result in results if result.winner == 1 - index]
+        first = [result.latencies[index][0] for result in results if result.latencies[index]]
+        rest = [latency for result in results for latency in result.latencies[index][1:]]
+        print(f"{bot:<16}{lost.count('timeout'):>9}{lost.count('crash'):>9}"
+              f"{lost.count('invalid'):>9}"
+              f"{sum(first) / max(1, len(first)) * 1000:>10.1f}"
+              f"{sum(rest) / max(1, len(rest)) * 1000:>9.1f}"
+              f"{max(rest, default=0) * 1000:>8.1f}")
+
+def main():
+    """Play the match given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("bot_a")
+    parser.add_argument("bot_b")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--first-turn-ms", type=int, default=FIRST_TURN_MS)
+    parser.add_argument("--turn-ms", type=int, default=TURN_MS)
+    args = parser.parse_args()
+    results = play_match(args.bot_a, args.bot_b, args.games, args.jobs,
+                         args.first_turn_ms, args.turn_ms)
+    report(args.bot_a, args.bot_b, results)
+
+if __name__ == "__main__":
+    main()
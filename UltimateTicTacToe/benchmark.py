@@ -0,0 +1,662 @@
+"""Offline benchmarks for the Ultimate TicTacToe bots.
+
+Usage: python benchmark.py <name> [args...]
+Run without arguments to list the available benchmarks.
+"""
+from contextlib import redirect_stderr
+import datetime
+import gc
+import importlib
+import inspect
+import io
+import os
+from random import Random, choice, random
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+BOTS = ["bot", "new_bot", "bot_gold"]
+
+IMPORT_PROBE = """
+import resource, time
+begin = time.perf_counter()
+import {module}
+print(time.perf_counter() - begin, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def measure_import(module: str, repeat: int = 5) -> tuple[float, int]:
+    """Return the best import time (s) and the peak RSS (KiB) of a fresh interpreter
+    importing `module`.
+
+    """
+    best_time = float("inf")
+    max_rss = 0
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+            cwd=DIRECTORY, capture_output=True, text=True, check=True
+        ).stdout.split()
+        best_time = min(best_time, float(output[0]))
+        max_rss = max(max_rss, int(output[1]))
+    return best_time, max_rss
+
+def bench_tables(*modules: str) -> None:
+    """Import time and peak RSS of the bots (lookup table construction)."""
+    _, baseline = measure_import("sys", 1)
+    print(f"{'module':<12}{'import ms':>12}{'RSS MiB':>10}{'tables MiB':>12}")
+    for module in modules or BOTS:
+        seconds, rss = measure_import(module)
+        print(f"{module:<12}{seconds * 1000:>12.1f}{rss / 1024:>10.1f}"
+              f"{(rss - baseline) / 1024:>12.1f}")
+
+def opening(plies: int, seed: int = 0) -> list[str]:
+    """Return a reproducible random opening of `plies` moves, as move strings."""
+    bot_gold = importlib.import_module("bot_gold")
+    rng = Random(seed)
+    state = (0, 0, None, False)
+    moves = []
+    for _ in range(plies):
+        cell = rng.choice(bot_gold.get_valid_moves(state))
+        state = bot_gold.next_state(state, cell)
+        moves.append(bot_gold.CELL_TO_STRING[cell])
+    return moves
+
+def setup_board(module, moves: list[str]):
+    """Return the UltimateBoard of `module` after playing `moves` from the start."""
+    if hasattr(module, "NodePool"):
+        board = module.UltimateBoard(True, module.STRING_TO_CELL[moves[0]])
+        for move in moves[1:]:
+            board.advance_root(module.STRING_TO_CELL[move])
+        return board
+
+    board = None
+    is_player_1 = True
+    for move in moves:
+        board = module.UltimateBoard(is_player_1, module.STRING_TO_ACTION[move], board)
+        is_player_1 = not is_player_1
+    board.parent = None
+    return board
+
+def count_iterations(board, run_time: float) -> int:
+    """Return the iterations board.run managed in run_time, read from its stderr log."""
+    log = io.StringIO()
+    with redirect_stderr(log):
+        board.run(run_time)
+    return int(log.getvalue().split()[-1])
+
+def bench_search(run_time: str = "1", *modules: str) -> None:
+    """Search iterations (expansion + rollout) per second of UltimateBoard.run."""
+    print(f"{'module':<12}{'plies':>6}{'iterations/s':>14}")
+    for module in modules or ("new_bot", "bot_gold"):
+        bot = importlib.import_module(module)
+        for plies in (1, 10, 20, 30):
+            board = setup_board(bot, opening(plies))
+            iterations = count_iterations(board, float(run_time))
+            print(f"{module:<12}{plies:>6}{iterations / float(run_time):>14.0f}")
+
+def count_nodes(board) -> int:
+    """Return the number of searched nodes below board."""
+    if hasattr(board, "pool"):
+        return sum(1 for state in board.pool.states[:board.pool.size] if state is not None)
+    return sum(count_nodes(child) for child in board.children_refs) + 1
+
+def bench_tree(run_time: str = "1", *modules: str) -> None:
+    """Nodes per second and peak memory of the object tree against the node pool."""
+    print(f"{'module':<12}{'plies':>6}{'nodes/s':>10}{'prealloc MiB':>14}"
+          f"{'peak MiB':>10}{'bytes/node':>12}")
+    for module in modules or ("new_bot", "bot_gold"):
+        bot = importlib.import_module(module)
+        for plies in (1, 20):
+            board = setup_board(bot, opening(plies))
+            count_iterations(board, float(run_time))
+            nodes_per_second = count_nodes(board) / float(run_time)
+            del board
+            gc.collect()
+            # memory from a second run, tracemalloc is too slow to time with
+            tracemalloc.start()
+            board = setup_board(bot, opening(plies))
+            prealloc = tracemalloc.get_traced_memory()[0]
+            count_iterations(board, float(run_time))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            nodes = count_nodes(board)
+            del board
+            gc.collect()
+            print(f"{module:<12}{plies:>6}{nodes_per_second:>10.0f}"
+                  f"{prealloc / 1024 / 1024:>14.1f}{peak / 1024 / 1024:>10.1f}"
+                  f"{(peak - prealloc) / nodes:>12.0f}")
+
+def bench_advance(run_time: str = ".1", plies: str = "30") -> None:
+    """Nodes retained and compaction time of UltimateBoard.advance_root in self-play."""
+    bot_gold = importlib.import_module("bot_gold")
+    board = setup_board(bot_gold, opening(1))
+    print(f"{'ply':>4}{'pool size':>10}{'retained':>10}{'compact ms':>12}")
+    for ply in range(int(plies)):
+        count_iterations(board, float(run_time))
+        if not board.get_valid_actions():
+            break
+        size = board.pool.size
+        begin = time.perf_counter()
+        retained = board.advance_root(board.pool.moves[board.best_child])
+        elapsed = time.perf_counter() - begin
+        print(f"{ply + 2:>4}{size:>10}{retained:>10}{elapsed * 1000:>12.2f}")
+
+def best_child(board, module):
+    """Return board advanced to its best child, for both kinds of tree."""
+    if hasattr(module, "NodePool"):
+        board.advance_root(board.pool.moves[board.best_child])
+        return board
+    board = board.best_child
+    board.parent = None
+    return board
+
+def bench_gc(run_time: str = ".1", plies: str = "20", *modules: str) -> None:
+    """Garbage collector pauses inside run() with and without a SearchSession."""
+    session = importlib.import_module("bot_gold").SearchSession()
+    pauses = []
+    begin = [0.0]
+    def on_gc(phase, _info):
+        if phase == "start":
+            begin[0] = time.perf_counter()
+        else:
+            pauses.append(time.perf_counter() - begin[0])
+    gc.callbacks.append(on_gc)
+    print(f"{'module':<12}{'session':>8}{'pauses':>8}{'max ms':>8}{'total ms':>10}"
+          f"{'iterations':>12}")
+    for module in modules or ("new_bot", "bot_gold"):
+        bot = importlib.import_module(module)
+        for use_session in (False, True):
+            gc.enable()
+            board = setup_board(bot, opening(1))
+            in_search = []
+            iterations = 0
+            for _ in range(int(plies)):
+                if not board.get_valid_actions():
+                    break
+                pauses.clear()
+                if use_session:
+                    with session:
+                        iterations += count_iterations(board, float(run_time))
+                else:
+                    iterations += count_iterations(board, float(run_time))
+                in_search.extend(pauses)
+                board = best_child(board, bot)
+                if use_session:
+                    with redirect_stderr(io.StringIO()):
+                        session.collect()
+            print(f"{module:<12}{use_session!s:>8}{len(in_search):>8}"
+                  f"{max(in_search, default=0) * 1000:>8.2f}{sum(in_search) * 1000:>10.2f}"
+                  f"{iterations:>12}")
+            del board
+    gc.enable()
+    gc.callbacks.remove(on_gc)
+
+def bench_deadline(run_time: str = ".095", turns: str = "30") -> None:
+    """Clock reads and overshoot of the Deadline checks in UltimateBoard.run."""
+    bot_gold = importlib.import_module("bot_gold")
+    begin = datetime.datetime.now()
+    old_check = timeit.timeit(
+        lambda: (datetime.datetime.now() - begin).total_seconds() < 1, number=100000
+    ) / 100000
+    new_check = timeit.timeit(time.perf_counter_ns, number=100000) / 100000
+    print(f"datetime check {old_check * 1e9:.0f} ns, perf_counter_ns {new_check * 1e9:.0f} ns")
+
+    checks = []
+    overshoots = []
+    iterations = 0
+    original = bot_gold.Deadline
+    class CountingDeadline(original):
+        """Deadline that remembers itself."""
+        def __init__(self, run_time):
+            super().__init__(run_time)
+            checks.append(self)
+    bot_gold.Deadline = CountingDeadline
+    # searching the way main() does, without the collector
+    session = bot_gold.SearchSession()
+    try:
+        board = setup_board(bot_gold, opening(1))
+        for _ in range(int(turns)):
+            if not board.get_valid_actions():
+                board = setup_board(bot_gold, opening(1))
+            start = time.perf_counter()
+            with session:
+                iterations += count_iterations(board, float(run_time))
+            overshoots.append(time.perf_counter() - start - float(run_time))
+            board.advance_root(board.pool.moves[board.best_child])
+            with redirect_stderr(io.StringIO()):
+                session.collect()
+    finally:
+        bot_gold.Deadline = original
+        gc.enable()
+    print(f"turns {len(overshoots)}, iterations/turn {iterations / len(overshoots):.0f}, "
+          f"clock reads/turn {sum(deadline.checks for deadline in checks) / len(checks):.0f}")
+    print(f"overshoot ms: mean {sum(overshoots) / len(overshoots) * 1000:.3f}, "
+          f"max {max(overshoots) * 1000:.3f}")
+
+def bench_batch(run_time: str = "1") -> None:
+    """Rollouts per second of simulate_batch at K=32/128 against the scalar simulate."""
+    bot_gold = importlib.import_module("bot_gold")
+    print(f"{'plies':>6}{'scalar/s':>10}{'K=32/s':>10}{'K=128/s':>10}"
+          f"{'run K=1/s':>11}{'run K=32/s':>12}{'run K=128/s':>13}")
+    for plies in (1, 20, 40):
+        moves = opening(plies)
+        board = setup_board(bot_gold, moves)
+        rates = []
+        for batch in (1, 32, 128):
+            rollouts = 0
+            end = time.perf_counter() + float(run_time)
+            while time.perf_counter() < end:
+                if batch == 1:
+                    bot_gold.simulate(board.state)
+                else:
+                    bot_gold.simulate_batch(board.state, batch)
+                rollouts += batch
+            rates.append(rollouts / float(run_time))
+        for batch in (1, 32, 128):
+            board = setup_board(bot_gold, moves)
+            board.batch = batch
+            rates.append(count_iterations(board, float(run_time)) * batch / float(run_time))
+        print(f"{plies:>6}" + "".join(f"{rate:>{width}.0f}"
+                                      for rate, width in zip(rates, (10, 10, 10, 11, 12, 13))))
+
+def simulate_choice(bot_gold, state: tuple) -> None:
+    """The rollout loop before the sampling tables: build the move list, then choice()."""
+    cell_bits, board_masks, macro_bits = bot_gold.CELL_BITS, bot_gold.BOARD_MASKS, \
+        bot_gold.MACRO_BITS
+    has_won, is_terminal = bot_gold.HAS_WON, bot_gold.IS_TERMINAL
+    valid_cells = bot_gold.VALID_CELLS
+    board_1, board_2, move, is_player_1 = state
+    occupied = board_1 | board_2
+    if is_terminal[(board_1 >> 81) << 9 | board_2 >> 81]:
+        return
+    while True:
+        big = move % 9
+        moves = valid_cells[big][occupied >> 9 * big & 0b111111111]
+        if not moves:
+            moves = []
+            for playable_board in bot_gold.VALID_ACTIONS[occupied >> 81]:
+                big = bot_gold.SMALL_TO_BIG[playable_board]
+                moves.extend(valid_cells[big][occupied >> 9 * big & 0b111111111])
+            if not moves:
+                break
+        move = choice(moves)
+        big = move // 9
+        occupied |= cell_bits[move]
+        is_player_1 = not is_player_1
+        if is_player_1:
+            board_1 |= cell_bits[move]
+            if has_won[board_1 >> 9 * big & 0b111111111]:
+                board_1 |= board_masks[big] | macro_bits[big]
+                board_2 &= ~board_masks[big]
+                occupied |= board_masks[big] | macro_bits[big]
+                if is_terminal[(board_1 >> 81) << 9 | board_2 >> 81]:
+                    break
+        else:
+            board_2 |= cell_bits[move]
+            if has_won[board_2 >> 9 * big & 0b111111111]:
+                board_1 &= ~board_masks[big]
+                board_2 |= board_masks[big] | macro_bits[big]
+                occupied |= board_masks[big] | macro_bits[big]
+                if is_terminal[(board_1 >> 81) << 9 | board_2 >> 81]:
+                    break
+
+def bench_rollout(run_time: str = "1") -> None:
+    """Rollouts per second of simulate against the choice() move list rollout."""
+    bot_gold = importlib.import_module("bot_gold")
+    print(f"{'plies':>6}{'choice/s':>10}{'tables/s':>10}{'speedup':>9}")
+    for plies in (1, 20, 40):
+        state = setup_board(bot_gold, opening(plies)).state
+        rates = []
+        for rollout in (lambda: simulate_choice(bot_gold, state),
+                        lambda: bot_gold.simulate(state)):
+            rollouts = 0
+            end = time.perf_counter() + float(run_time)
+            while time.perf_counter() < end:
+                rollout()
+                rollouts += 1
+            rates.append(rollouts / float(run_time))
+        print(f"{plies:>6}{rates[0]:>10.0f}{rates[1]:>10.0f}{rates[1] / rates[0]:>9.2f}")
+
+def silence_stderr() -> None:
+    """Process pool initializer that drops the iteration logs of the workers."""
+    sys.stderr = open(os.devnull, "w", encoding="utf-8")
+
+def bench_parallel(run_time: str = "1", *workers: str) -> None:
+    """Iterations per second of root parallel run_parallel at 1/2/4/8 workers."""
+    from concurrent.futures import ProcessPoolExecutor
+    bot_gold = importlib.import_module("bot_gold")
+    print(f"cpus {os.cpu_count()}")
+    print(f"{'plies':>6}{'workers':>8}{'iterations/s':>14}{'speedup':>9}{'best visits':>13}")
+    for plies in (1, 20):
+        moves = opening(plies)
+        single = None
+        for count in map(int, workers or ("1", "2", "4", "8")):
+            board = setup_board(bot_gold, moves)
+            with ProcessPoolExecutor(max(1, count - 1),
+                                     initializer=silence_stderr) as executor:
+                # start the workers before timing
+                executor.submit(int).result()
+                with redirect_stderr(io.StringIO()):
+                    iterations = board.run_parallel(float(run_time), count, executor)
+            rate = iterations / float(run_time)
+            single = single or rate
+            print(f"{plies:>6}{count:>8}{rate:>14.0f}{rate / single:>9.2f}"
+                  f"{board.pool.visits[board.best_child]:>13}")
+
+def bench_transpositions(run_time: str = ".1", entries: str = "65536") -> None:
+    """Effective simulations per move of the transposition table against the plain tree."""
+    bot_gold = importlib.import_module("bot_gold")
+    print(f"{'plies':>6}{'table':>7}{'iterations':>11}{'best visits':>12}{'root visits':>12}"
+          f"{'nodes':>7}{'hits':>7}{'replaced':>9}{'compact ms':>11}")
+    for plies in (1, 10, 20, 30, 40):
+        state = setup_board(bot_gold, opening(plies)).state
+        for transpositions in (0, int(entries)):
+            board = bot_gold.UltimateBoard.from_state(
+                state, bot_gold.NodePool(bot_gold.POOL_CAPACITY, transpositions))
+            iterations = count_iterations(board, float(run_time))
+            if not board.get_valid_actions():
+                break
+            _, visits, _ = board.root_statistics()
+            best = max(visits)
+            table = board.pool.table
+            nodes = board.pool.size
+            begin = time.perf_counter()
+            board.advance_root(board.pool.moves[board.best_child])
+            elapsed = time.perf_counter() - begin
+            print(f"{plies:>6}{transpositions:>7}{iterations:>11}{best:>12}{sum(visits):>12}"
+                  f"{nodes:>7}{table.hits if table else 0:>7}"
+                  f"{table.replaced if table else 0:>9}{elapsed * 1000:>11.2f}")
+
+def random_positions(count: int, seed: int = 0) -> list[tuple]:
+    """Return reproducible states of random games 20 to 50 plies in, not finished."""
+    bot_gold = importlib.import_module("bot_gold")
+    rng = Random(seed)
+    positions = []
+    while len(positions) < count:
+        state = (0, 0, None, False)
+        for _ in range(rng.randrange(20, 50)):
+            moves = bot_gold.get_valid_moves(state)
+            if not moves or bot_gold.IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81]:
+                break
+            state = bot_gold.next_state(state, rng.choice(moves))
+        else:
+            if bot_gold.get_valid_moves(state):
+                positions.append(state)
+    return positions
+
+def random_free_move_walk(bot_gold, occupied: int) -> int:
+    """The free choice sampling before the free cell mask: count, then walk the boards."""
+    free = 0
+    for playable_board in bot_gold.VALID_ACTIONS[occupied >> 81]:
+        big = bot_gold.SMALL_TO_BIG[playable_board]
+        free += bot_gold.VALID_ACTIONS_LEN[occupied >> 9 * big & 0b111111111]
+    if not free:
+        return None
+    index = int(random() * free)
+    for playable_board in bot_gold.VALID_ACTIONS[occupied >> 81]:
+        big = bot_gold.SMALL_TO_BIG[playable_board]
+        board = occupied >> 9 * big & 0b111111111
+        if index < bot_gold.VALID_ACTIONS_LEN[board]:
+            return bot_gold.VALID_CELLS[big][board][index]
+        index -= bot_gold.VALID_ACTIONS_LEN[board]
+    return None
+
+def bench_movegen(positions: str = "2000") -> None:
+    """Move generation and free choice sampling on random mid-game positions."""
+    bot_gold = importlib.import_module("bot_gold")
+    states = random_positions(int(positions))
+    # as if the forced board were full: the free choice of the same boards
+    free_choices = [state[0] | state[1] for state in states]
+    late = [occupied for occupied in free_choices
+            if (~occupied & bot_gold.CELLS_MASK).bit_count() < 20]
+    cases = [
+        ("get_valid_moves", lambda: [bot_gold.get_valid_moves(state) for state in states]),
+        ("free list", lambda: [bot_gold.get_valid_moves((occupied, 0, None, False))
+                               for occupied in free_choices]),
+        ("free walk", lambda: [random_free_move_walk(bot_gold, occupied)
+                               for occupied in free_choices]),
+        ("free sample", lambda: [bot_gold.random_free_move(occupied)
+                                 for occupied in free_choices]),
+        ("late walk", lambda: [random_free_move_walk(bot_gold, occupied) for occupied in late]),
+        ("late sample", lambda: [bot_gold.random_free_move(occupied) for occupied in late]),
+    ]
+    free = sum((~occupied & bot_gold.CELLS_MASK).bit_count() for occupied in free_choices)
+    print(f"{len(states)} positions, {free / len(states):.1f} free cells on average, "
+          f"{len(late)} with less than 20")
+    for name, generate in cases:
+        count = len(late) if name.startswith("late") else len(states)
+        seconds = min(timeit.repeat(generate, number=5, repeat=5)) / 5
+        print(f"{name:<16}{seconds / max(1, count) * 1e9:>8.0f} ns")
+
+def count_plies(rollout, state: tuple, rollouts: int, loop=None) -> float:
+    """Return the mean plies of rollouts from state, counted with a line tracer
+    on the line of the rollout loop that runs once per move played. loop is the
+    function of that loop, rollout itself if None.
+
+    """
+    loop = rollout if loop is None else loop
+    source, first_line = inspect.getsourcelines(loop)
+    ply_line = first_line + next(index for index, line in enumerate(source)
+                                 if line.strip() == "big = move // 9")
+    plies = 0
+    def trace(frame, event, _arg):
+        nonlocal plies
+        if frame.f_code is not loop.__code__:
+            return None
+        if event == "line" and frame.f_lineno == ply_line:
+            plies += 1
+        return trace
+    sys.settrace(trace)
+    try:
+        for _ in range(rollouts):
+            rollout(state)
+    finally:
+        sys.settrace(None)
+    return plies / rollouts
+
+def bench_playout(run_time: str = "1") -> None:
+    """Per ply cost and first player wins of the random and heavy playouts."""
+    bot_gold = importlib.import_module("bot_gold")
+    print(f"{'plies':>6}{'policy':>8}{'rollouts/s':>12}{'plies/rollout':>15}{'ns/ply':>8}"
+          f"{'player 1 wins':>15}")
+    for plies in (1, 20, 40):
+        state = setup_board(bot_gold, opening(plies)).state
+        for name, rollout in (("random", bot_gold.simulate), ("heavy", bot_gold.simulate_heavy)):
+            rollouts = 0
+            wins = 0
+            end = time.perf_counter() + float(run_time)
+            while time.perf_counter() < end:
+                wins += bot_gold.HAS_WON[rollout(state)[0]]
+                rollouts += 1
+            length = count_plies(rollout, state, 200, bot_gold.simulate)
+            print(f"{plies:>6}{name:>8}{rollouts / float(run_time):>12.0f}{length:>15.1f}"
+                  f"{float(run_time) / rollouts / length * 1e9:>8.0f}{wins / rollouts:>15.3f}")
+
+def bench_rave(run_time: str = ".1", positions: str = "10", reference: str = "2") -> None:
+    """Iterations and best move agreement with a long plain search, with and without RAVE."""
+    bot_gold = importlib.import_module("bot_gold")
+    print(f"{'plies':>6}{'rave':>6}{'iterations':>11}{'agreement':>10}")
+    for plies in (1, 20, 40):
+        states = []
+        for seed in range(int(positions)):
+            state = setup_board(bot_gold, opening(plies, seed)).state
+            if bot_gold.get_valid_moves(state):
+                board = bot_gold.UltimateBoard.from_state(state)
+                count_iterations(board, float(reference))
+                states.append((state, board.pool.moves[board.best_child]))
+        for rave in (False, True):
+            iterations = agreed = 0
+            for state, best in states:
+                board = bot_gold.UltimateBoard.from_state(
+                    state, bot_gold.NodePool(bot_gold.POOL_CAPACITY, rave=rave))
+                iterations += count_iterations(board, float(run_time))
+                agreed += board.pool.moves[board.best_child] == best
+            print(f"{plies:>6}{rave:>6}{iterations // len(states):>11}"
+                  f"{agreed / len(states):>10.2f}")
+
+def game_over(bot_gold, state: tuple) -> bool:
+    """Whether the game of state is finished."""
+    return bool(bot_gold.IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81]
+                or not bot_gold.get_valid_moves(state))
+
+def bench_solver(run_time: str = ".05", games: str = "6") -> None:
+    """Simulations per self-play game spent on decided positions, with and without the solver."""
+    bot_gold = importlib.import_module("bot_gold")
+    terminal_value = bot_gold.terminal_value
+    simulate = bot_gold.simulate
+    decided = 0
+    def counting_simulate(state: tuple) -> tuple:
+        nonlocal decided
+        decided += game_over(bot_gold, state)
+        return simulate(state)
+
+    print(f"{'solver':>7}{'plies':>7}{'iterations':>11}{'decided':>9}{'early turns':>12}"
+          f"{'avoided':>9}")
+    bot_gold.simulate = counting_simulate
+    try:
+        for solver in (False, True):
+            # without proofs the solver never prunes nor stops early
+            bot_gold.terminal_value = terminal_value if solver else lambda state: 0
+            plies = iterations = early = avoided = 0
+            decided = 0
+            for game in range(int(games)):
+                bot_gold.seed_rng(game)
+                board = bot_gold.UltimateBoard.from_state((0, 0, None, False))
+                while not game_over(bot_gold, board.state):
+                    begin = time.perf_counter()
+                    with redirect_stderr(io.StringIO()):
+                        count = board.run(float(run_time))
+                    elapsed = time.perf_counter() - begin
+                    iterations += count
+                    if elapsed < float(run_time) * .9:
+                        # the iterations the rest of the turn would have run
+                        early += 1
+                        avoided += int(count / elapsed * (float(run_time) - elapsed))
+                    board.advance_root(board.pool.moves[board.best_child])
+                    plies += 1
+            games_count = int(games)
+            print(f"{solver:>7}{plies / games_count:>7.1f}{iterations // games_count:>11}"
+                  f"{decided // games_count:>9}{early / games_count:>12.1f}"
+                  f"{avoided // games_count:>9}")
+    finally:
+        bot_gold.simulate = simulate
+        bot_gold.terminal_value = terminal_value
+
+def late_position(bot_gold, rng: Random, cells: int) -> tuple:
+    """First position of a random game with at most cells empty cells."""
+    while True:
+        state = (0, 0, None, False)
+        while not game_over(bot_gold, state):
+            if (~(state[0] | state[1]) & bot_gold.CELLS_MASK).bit_count() <= cells:
+                return state
+            state = bot_gold.next_state(state, rng.choice(bot_gold.get_valid_moves(state)))
+
+def bench_endgame(positions: str = "5", limit: str = "2") -> None:
+    """Time to prove the value of late positions, by the endgame solver and by the search."""
+    bot_gold = importlib.import_module("bot_gold")
+    rng = Random(0)
+    print(f"{'cells':>6}{'solver ms':>10}{'solved':>7}{'search ms':>10}{'solved':>7}")
+    for cells in (10, 15, 20, 25, 30, 35, 40):
+        states = [late_position(bot_gold, rng, cells) for _ in range(int(positions))]
+        times = {False: [], True: []}
+        for state in states:
+            for endgame in (True, False):
+                board = bot_gold.UltimateBoard.from_state(state, endgame=81 if endgame else 0)
+                begin = time.perf_counter()
+                with redirect_stderr(io.StringIO()):
+                    board.run(float(limit))
+                if board.pool.proven[board.root]:
+                    times[endgame].append(time.perf_counter() - begin)
+        row = f"{cells:>6}"
+        for endgame in (True, False):
+            solved = sorted(times[endgame])
+            median = solved[len(solved) // 2] * 1000 if solved else float("nan")
+            row += f"{median:>10.1f}{len(solved):>4}/{len(states):<2}"
+        print(row)
+
+def bench_symmetry(games: str = "200", plies: str = "8") -> None:
+    """Root branching factor with and without the symmetric moves, by ply of random games."""
+    bot_gold = importlib.import_module("bot_gold")
+    rng = Random(0)
+    print(f"{'ply':>4}{'games':>7}{'moves':>8}{'unique':>8}{'symmetric':>10}{'canonical us':>13}")
+    states = [(0, 0, None, False)] * int(games)
+    for ply in range(int(plies)):
+        moves = unique = symmetric = 0
+        begin = time.perf_counter()
+        for state in states:
+            bot_gold.canonical_state(state)
+        elapsed = time.perf_counter() - begin
+        for state in states:
+            legal, pruned = len(bot_gold.get_valid_moves(state)), len(bot_gold.unique_moves(state))
+            moves += legal
+            unique += pruned
+            symmetric += pruned < legal
+        print(f"{ply:>4}{len(states):>7}{moves / len(states):>8.2f}{unique / len(states):>8.2f}"
+              f"{symmetric:>10}{elapsed / len(states) * 1e6:>13.1f}")
+        states = [bot_gold.next_state(state, rng.choice(bot_gold.get_valid_moves(state)))
+                  for state in states]
+
+def bench_ponder(run_time: str = ".05", games: str = "4") -> None:
+    """Visits kept from the turn before by the root after the opponent's move,
+    with and without pondering for the opponent's run_time.
+
+    """
+    bot_gold = importlib.import_module("bot_gold")
+    print(f"{'ponder':>7}{'turns':>7}{'iterations':>11}{'kept visits':>12}")
+    for ponder in (False, True):
+        bot_gold.seed_rng(0)
+        kept = []
+        iterations = 0
+        for _ in range(int(games)):
+            us = bot_gold.UltimateBoard.from_state((0, 0, None, False))
+            opponent = bot_gold.UltimateBoard.from_state((0, 0, None, False))
+            with redirect_stderr(io.StringIO()):
+                while not game_over(bot_gold, us.state):
+                    move = us.choose_move(float(run_time))
+                    us.compact()
+                    opponent.advance_root(move)
+                    if game_over(bot_gold, us.state):
+                        break
+                    if ponder:
+                        # the opponent thinks as long as we do
+                        iterations += us.run(float(run_time))
+                    reply = opponent.choose_move(float(run_time))
+                    opponent.compact()
+                    us.advance_root(reply, compact=False)
+                    kept.append(us.pool.visits[us.pool.shared[us.root]])
+        print(f"{ponder:>7}{len(kept):>7}{iterations / len(kept):>11.1f}"
+              f"{sum(kept) / len(kept):>12.1f}")
+
+BENCHMARKS = {
+    "tables": bench_tables,
+    "search": bench_search,
+    "tree": bench_tree,
+    "advance": bench_advance,
+    "gc": bench_gc,
+    "deadline": bench_deadline,
+    "batch": bench_batch,
+    "rollout": bench_rollout,
+    "parallel": bench_parallel,
+    "transpositions": bench_transpositions,
+    "movegen": bench_movegen,
+    "playout": bench_playout,
+    "rave": bench_rave,
+    "solver": bench_solver,
+    "endgame": bench_endgame,
+    "symmetry": bench_symmetry,
+    "ponder": bench_ponder,
+}
+
+def main():
+    """Run the benchmark named on the command line."""
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        for name, benchmark in BENCHMARKS.items():
+            print(f"{name:<12}{benchmark.__doc__}")
+        return
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,46 @@
 """My implementation for Codingame Ultimate TicTacToe."""
 from __future__ import annotations
 from abc import ABC, abstractmethod
-import datetime
+from array import array
+import gc
 from functools import lru_cache
+from itertools import accumulate
 from math import log, sqrt
-from random import choice, shuffle
+from random import Random
+import select
 import sys
+import time
 
-# RAND_INDEX = 0
-# RANDOM_MOVES = [
-#     randrange(0, 1000) for _ in range(1000)
-# ]
-# def get_randomint(max_val):
-#     global RAND_INDEX
-#     res = (RANDOM_MOVES[RAND_INDEX])%max_val
-#     RAND_INDEX += 1
-#     if RAND_INDEX > 999:
-#         shuffle(RANDOM_MOVES)
-#         RAND_INDEX = 0
-#     return res
+# the referee may count the first turn from the start of the process
+PROCESS_BEGIN_NS = time.perf_counter_ns()
+
+# numpy is only needed by the batched rollouts, and importing it takes most of
+# the import time of this module: numpy_tables imports it on first use
+np = None
+
+# Every random number of the search comes from RNG: the rollouts draw with
+# random(), its bound method, and expand orders the children with it. The
+# batched rollouts draw from NumPy's PCG64, seeded alike. Seeding both
+# (seed_rng, or --seed on the command line) makes a search stopped by an
+# IterationDeadline the same bit for bit. A pregenerated buffer of numbers
+# costs as much per draw as the C random() of the Mersenne Twister, and a
+# xorshift in Python over ten times more, so the draws stay on it.
+RNG = Random()
+random = RNG.random
+RNG_SEED = None
+def seed_rng(value: int = None, rng: Random = None) -> None:
+    """Seed the random numbers of the search, from the os if value is None.
+    rng, any random.Random, replaces RNG.
+
+    """
+    global RNG, RNG_SEED, random
+    if rng is not None:
+        RNG = rng
+    RNG.seed(value)
+    random = RNG.random
+    RNG_SEED = value
+    if NUMPY_TABLES:
+        NUMPY_TABLES["rng"] = np.random.default_rng(value)
 
 MOVES = [
     0b000000001,
@@ -247,46 +269,374 @@ STRING_TO_ACTION = {
     "8 7": (8, 0b000000010),
     "8 8": (8, 0b000000001),
 }
-@lru_cache
-def won(board):
-    """Returns lambda to determine win."""
-    return lambda move: not move & board
-VALID_ACTIONS = {
-    board: list(filter(won(board), MOVES))
+# BEGIN GENERATED TABLES (python generate_boards.py)
+HAS_WON_BITS = int(
+    "fffffffffffffffffffef0f0eeee8080fffafaf0fafaaa80fffaf0f0aaaa8080"
+    "fffcaa80fefcaa80ffcc8080cccc8080fff0aa80faf0aa80ff80808080808080",
+    16
+)
+VALID_ACTIONS_LEN_DIGITS = (
+    "9887877687767665877676657665655487767665766565547665655465545443"
+    "8776766576656554766565546554544376656554655454436554544354434332"
+    "8776766576656554766565546554544376656554655454436554544354434332"
+    "7665655465545443655454435443433265545443544343325443433243323221"
+    "8776766576656554766565546554544376656554655454436554544354434332"
+    "7665655465545443655454435443433265545443544343325443433243323221"
+    "7665655465545443655454435443433265545443544343325443433243323221"
+    "6554544354434332544343324332322154434332433232214332322132212110"
+)
+VALID_MOVES_DIGITS = (
+    "8765432107654321086543210654321087543210754321085432105432108764"
+    "3210764321086432106432108743210743210843210432108765321076532108"
+    "6532106532108753210753210853210532108763210763210863210632108732"
+    "1073210832103210876542107654210865421065421087542107542108542105"
+    "4210876421076421086421064210874210742108421042108765210765210865"
+    "2106521087521075210852105210876210762108621062108721072108210210"
+    "8765431076543108654310654310875431075431085431054310876431076431"
+    "0864310643108743107431084310431087653107653108653106531087531075"
+    "3108531053108763107631086310631087310731083103108765410765410865"
+    "4106541087541075410854105410876410764108641064108741074108410410"
+    "8765107651086510651087510751085105108761076108610610871071081010"
+    "8765432076543208654320654320875432075432085432054320876432076432"
+    "0864320643208743207432084320432087653207653208653206532087532075"
+    "3208532053208763207632086320632087320732083203208765420765420865"
+    "4206542087542075420854205420876420764208642064208742074208420420"
+    "8765207652086520652087520752085205208762076208620620872072082020"
+    "8765430765430865430654308754307543085430543087643076430864306430"
+    "8743074308430430876530765308653065308753075308530530876307630863"
+    "0630873073083030876540765408654065408754075408540540876407640864"
+    "0640874074084040876507650865065087507508505087607608606087070800"
+    "8765432176543218654321654321875432175432185432154321876432176432"
+    "1864321643218743217432184321432187653217653218653216532187532175"
+    "3218532153218763217632186321632187321732183213218765421765421865"
+    "4216542187542175421854215421876421764218642164218742174218421421"
+    "8765217652186521652187521752185215218762176218621621872172182121"
+    "8765431765431865431654318754317543185431543187643176431864316431"
+    "8743174318431431876531765318653165318753175318531531876317631863"
+    "1631873173183131876541765418654165418754175418541541876417641864"
+    "1641874174184141876517651865165187517518515187617618616187171811"
+    "8765432765432865432654328754327543285432543287643276432864326432"
+    "8743274328432432876532765328653265328753275328532532876327632863"
+    "2632873273283232876542765428654265428754275428542542876427642864"
+    "2642874274284242876527652865265287527528525287627628626287272822"
+    "8765437654386543654387543754385435438764376438643643874374384343"
+    "8765376538653653875375385353876376386363873738338765476548654654"
+    "8754754854548764764864648747484487657658656587575855876768668778"
+)
+# END GENERATED TABLES
+HAS_WON = bytes(HAS_WON_BITS >> state & 1 for state in range(0b1000000000))
+VALID_ACTIONS_LEN = bytes(map(int, VALID_ACTIONS_LEN_DIGITS))
+VALID_ACTIONS_OFFSET = array('H', accumulate(VALID_ACTIONS_LEN, initial=0))
+VALID_MOVES = bytes(map(int, VALID_MOVES_DIGITS))
+VALID_ACTIONS = [
+    [BIG_TO_SMALL[small] for small in
+        VALID_MOVES[VALID_ACTIONS_OFFSET[board]:VALID_ACTIONS_OFFSET[board + 1]]]
     for board in range(0b000000000, 0b1000000000)
-}
-VALID_ACTIONS_LEN = {
-    board: len(actions)
-    for board, actions in VALID_ACTIONS.items()
-}
-def to_big(index):
-    """Returns lambda to translate small to big move."""
-    return lambda action: (index, action)
-
-TRANSLATED_VALID_ACTIONS = {
-    index: {
-        board: list(map(to_big(index), VALID_ACTIONS[board]))
+]
+VALID_CELLS = [
+    [
+        [9 * big + small for small in
+            VALID_MOVES[VALID_ACTIONS_OFFSET[board]:VALID_ACTIONS_OFFSET[board + 1]]]
         for board in range(0b000000000, 0b1000000000)
-    } for index in range(9)
-}
+    ] for big in range(9)
+]
 
-def win(state):
-    """Returns whether state is a win."""
-    return lambda win: ((win & state) == win)
-HAS_WON = {
-    state: any(map(win(state), WINS))
-    for state in range(0b000000000, 0b1000000000)
-}
-IS_TERMINAL = {
-    player_1: {
-        player_2: HAS_WON[player_1] \
-            or HAS_WON[player_2] \
-            or (player_1 | player_2) == 0b111111111
-        for player_2 in range(0b000000000, 0b1000000000)
-    }
-    for player_1 in range(0b000000000, 0b1000000000)
+def terminal_row(player_1):
+    """Returns the IS_TERMINAL row of player_1 against every player_2."""
+    if HAS_WON[player_1]:
+        return b"\x01" * 0b1000000000
+    row = bytearray(HAS_WON)
+    subset = player_1
+    while True:
+        # full board: player_2 holds every cell player_1 does not
+        row[(0b111111111 ^ player_1) | subset] = 1
+        if not subset:
+            return bytes(row)
+        subset = (subset - 1) & player_1
+# Indexed by player_1 << 9 | player_2
+IS_TERMINAL = b"".join(map(terminal_row, range(0b000000000, 0b1000000000)))
+
+# Packed state: (board_1, board_2, move, is_player_1)
+# board_1/board_2 hold the 81 cells of a player, sub board `big` in bits 9 * big
+# onwards using the same 9-bit layout as the old grids, and the won macro boards
+# in bits 81 to 89. move is the cell (9 * big + small) played last, by player 1
+# if is_player_1. States are immutable tuples, so children share nothing.
+CELL_BITS = [1 << (9 * big + 8 - small) for big in range(9) for small in range(9)]
+BOARD_MASKS = [0b111111111 << 9 * big for big in range(9)]
+MACRO_BITS = [BIG_TO_SMALL[big] << 81 for big in range(9)]
+CELL_TO_STRING = [
+    ACTION_TO_STRING[(big, BIG_TO_SMALL[small])] for big in range(9) for small in range(9)
+]
+STRING_TO_CELL = {
+    string: 9 * big + SMALL_TO_BIG[small] for string, (big, small) in STRING_TO_ACTION.items()
 }
 
+def next_state(state: tuple, cell: int) -> tuple:
+    """Return the state after the player to move plays cell."""
+    board_1, board_2, _, is_player_1 = state
+    big = cell // 9
+    if is_player_1:
+        board_2 |= CELL_BITS[cell]
+        if HAS_WON[board_2 >> 9 * big & 0b111111111]:
+            board_1 &= ~BOARD_MASKS[big]
+            board_2 |= BOARD_MASKS[big] | MACRO_BITS[big]
+    else:
+        board_1 |= CELL_BITS[cell]
+        if HAS_WON[board_1 >> 9 * big & 0b111111111]:
+            board_1 |= BOARD_MASKS[big] | MACRO_BITS[big]
+            board_2 &= ~BOARD_MASKS[big]
+    return board_1, board_2, cell, not is_player_1
+
+def get_valid_moves(state: tuple) -> list[int]:
+    """List of valid cells in state. Note: the list may be shared, do not modify it!"""
+    board_1, board_2, move, _ = state
+    occupied = board_1 | board_2
+    if move is not None:
+        big = move % 9
+        valid_moves = VALID_CELLS[big][occupied >> 9 * big & 0b111111111]
+        if valid_moves:
+            return valid_moves
+
+    valid_moves = []
+    for playable_board in VALID_ACTIONS[occupied >> 81]:
+        big = SMALL_TO_BIG[playable_board]
+        valid_moves.extend(VALID_CELLS[big][occupied >> 9 * big & 0b111111111])
+    return valid_moves
+
+# The packed boards are the incremental bitboards of the game: a won board is
+# filled, so the free cells of any open board are the zero bits of occupied, and
+# the zero macro bits of occupied are the open-board mask, kept up by every
+# board won. A full board left undecided is the only closed board it misses.
+CELLS_MASK = (1 << 81) - 1
+def open_board_tables() -> tuple[list[tuple], list[tuple]]:
+    """Returns the boards of each open-board mask, the last board first as in
+    get_valid_moves, and their cells. Each mask extends the one without its
+    lowest bit, the board with the highest index.
+
+    """
+    boards = [()]
+    cells = [()]
+    for open_boards in range(1, 0b1000000000):
+        big = 9 - (open_boards & -open_boards).bit_length()
+        rest = open_boards & open_boards - 1
+        boards.append((big,) + boards[rest])
+        cells.append(tuple(range(9 * big, 9 * big + 9)) + cells[rest])
+    return boards, cells
+OPEN_BOARDS, OPEN_CELLS = open_board_tables()
+# cells of the open boards drawn at random for a free choice before counting
+# the free cells
+FREE_MOVE_TRIES = 6
+def random_free_move(occupied: int, index: int = None) -> int:
+    """Return a uniformly random valid cell when any open board may be played,
+    or the cell `index` of get_valid_moves if it is given. None if there is none.
+    Cells of the open boards are drawn until a free one comes up, a few times,
+    before walking the free cell counts of the open boards: late in the game
+    the boards won are out of the draw, and of the walk.
+
+    """
+    open_boards = ~occupied >> 81 & 0b111111111
+    if index is None:
+        cells = OPEN_CELLS[open_boards]
+        span = len(cells)
+        for _ in range(FREE_MOVE_TRIES):
+            cell = cells[int(random() * span)]
+            if not occupied & CELL_BITS[cell]:
+                return cell
+        free = (~occupied & CELLS_MASK).bit_count()
+        if not free:
+            return None
+        index = int(random() * free)
+
+    for big in OPEN_BOARDS[open_boards]:
+        board = occupied >> 9 * big & 0b111111111
+        if index < VALID_ACTIONS_LEN[board]:
+            return VALID_CELLS[big][board][index]
+        index -= VALID_ACTIONS_LEN[board]
+    return None
+
+# free cells that complete a line of the 9-bit board own, as a 9-bit mask
+WINNING_CELLS = array('H', (
+    sum(1 << bit for bit in range(9) if not own >> bit & 1 and HAS_WON[own | 1 << bit])
+    for own in range(0b1000000000)
+))
+def simulate(state: tuple, heavy: bool = False) -> tuple[int, int, bool, int, int]:
+    """Play random moves from state until the game is over, or with heavy the
+    moves of simulate_heavy. Both pick their cell and play it in the same loop.
+    Returns the macro boards of both players, who played last and the cells
+    played by either player (CELL_BITS masks).
+
+    """
+    board_1, board_2, move, is_player_1 = state
+    # a won board is filled up, so occupied only changes by the cells played
+    occupied = board_1 | board_2
+    if IS_TERMINAL[(board_1 >> 81) << 9 | board_2 >> 81]:
+        return board_1 >> 81, board_2 >> 81, is_player_1, 0, 0
+
+    # the cells each player played, for the all moves as first statistics
+    played_1 = played_2 = 0
+    # the board of the next move and its free cells, none on the empty board:
+    # its first move may go anywhere, as after a closed board
+    big = board = free = 0
+    if move is not None:
+        big = move % 9
+        board = occupied >> 9 * big & 0b111111111
+        free = VALID_ACTIONS_LEN[board]
+    while True:
+        if not free:
+            move = random_free_move(occupied)
+            if move is None:
+                break
+        elif not heavy:
+            move = VALID_CELLS[big][board][int(random() * free)]
+        else:
+            shift = 9 * big
+            # player 1 moves when player 2 made the last move
+            if is_player_1:
+                other = board_1
+                wins = WINNING_CELLS[board_2 >> shift & 0b111111111] & ~board
+            else:
+                other = board_2
+                wins = WINNING_CELLS[board_1 >> shift & 0b111111111] & ~board
+            if not wins:
+                wins = WINNING_CELLS[other >> shift & 0b111111111] & ~board
+            if wins:
+                move = shift + 9 - (wins & -wins).bit_length()
+            else:
+                move = VALID_CELLS[big][board][int(random() * free)]
+                target = 9 * (move % 9)
+                target_board = (occupied | CELL_BITS[move]) >> target & 0b111111111
+                if free > 1 and (target_board == 0b111111111 or WINNING_CELLS[
+                        other >> target & 0b111111111] & ~target_board):
+                    # one more draw, kept whatever it sends to
+                    move = VALID_CELLS[big][board][int(random() * free)]
+
+        big = move // 9
+        bit = CELL_BITS[move]
+        occupied |= bit
+        is_player_1 = not is_player_1
+        if is_player_1:
+            board_1 |= bit
+            played_1 |= bit
+            if HAS_WON[board_1 >> 9 * big & 0b111111111]:
+                board_1 |= BOARD_MASKS[big] | MACRO_BITS[big]
+                board_2 &= ~BOARD_MASKS[big]
+                occupied |= BOARD_MASKS[big] | MACRO_BITS[big]
+                if IS_TERMINAL[(board_1 >> 81) << 9 | board_2 >> 81]:
+                    break
+        else:
+            board_2 |= bit
+            played_2 |= bit
+            if HAS_WON[board_2 >> 9 * big & 0b111111111]:
+                board_1 &= ~BOARD_MASKS[big]
+                board_2 |= BOARD_MASKS[big] | MACRO_BITS[big]
+                occupied |= BOARD_MASKS[big] | MACRO_BITS[big]
+                if IS_TERMINAL[(board_1 >> 81) << 9 | board_2 >> 81]:
+                    break
+        big = move % 9
+        board = occupied >> 9 * big & 0b111111111
+        free = VALID_ACTIONS_LEN[board]
+
+    return board_1 >> 81, board_2 >> 81, is_player_1, played_1, played_2
+
+# play heavy playouts (simulate_heavy) in the search of main()
+HEAVY_PLAYOUTS = False
+def simulate_heavy(state: tuple) -> tuple[int, int, bool, int, int]:
+    """Play moves from state until the game is over, like simulate, but on a
+    forced board take a cell that wins it, else block the opponent's, else
+    play a random cell that, if possible, does not send the opponent to a board
+    it can win at once or that gives it a free choice.
+    Returns the same as simulate.
+
+    """
+    return simulate(state, True)
+
+NUMPY_TABLES = {}
+def numpy_tables() -> dict:
+    """The lookup tables as NumPy arrays, built on first use."""
+    global np
+    if not NUMPY_TABLES:
+        import numpy as np
+        NUMPY_TABLES.update(
+            has_won=np.frombuffer(HAS_WON, dtype=np.uint8).astype(bool),
+            is_terminal=np.frombuffer(IS_TERMINAL, dtype=np.uint8).astype(bool),
+            free_count=np.frombuffer(VALID_ACTIONS_LEN, dtype=np.uint8).astype(np.int64),
+            # small index of the n-th free cell of a board
+            nth_free=np.array([
+                VALID_CELLS[0][board] + [0] * (9 - VALID_ACTIONS_LEN[board])
+                for board in range(0b000000000, 0b1000000000)
+            ], dtype=np.int64),
+            small_bits=np.array([BIG_TO_SMALL[small] for small in range(9)], dtype=np.int64),
+            boards=np.arange(9),
+            rng=np.random.default_rng(RNG_SEED),
+        )
+    return NUMPY_TABLES
+
+def simulate_batch(state: tuple, count: int) -> tuple:
+    """Play count random games from state in lockstep on NumPy arrays.
+    All games have the same player to move at every ply, so each ply is a
+    handful of vectorized gathers on the lookup tables for every live game.
+    Returns the final macro boards of both players, one entry per game.
+
+    """
+    tables = numpy_tables()
+    has_won = tables["has_won"]
+    free_count = tables["free_count"]
+    boards = tables["boards"]
+    board_1, board_2, move, is_player_1 = state
+
+    grids = np.empty((2, count, 9), dtype=np.int64)
+    grids[0] = [board_1 >> 9 * big & 0b111111111 for big in range(9)]
+    grids[1] = [board_2 >> 9 * big & 0b111111111 for big in range(9)]
+    macros = np.empty((2, count), dtype=np.int64)
+    macros[0] = board_1 >> 81
+    macros[1] = board_2 >> 81
+    # the first move of the empty board may go anywhere, as after a closed board
+    anywhere = move is None
+    forced = np.full(count, 0 if anywhere else move % 9)
+    player = 1 if is_player_1 else 0
+    live = np.arange(count)
+    if IS_TERMINAL[(board_1 >> 81) << 9 | board_2 >> 81]:
+        live = live[:0]
+
+    while live.size:
+        occupied = grids[0, live] | grids[1, live]
+        counts = free_count[occupied]
+        games = np.arange(live.size)
+        forced_board = forced[live]
+        # a closed forced board leaves the choice between every open board
+        is_forced = counts[games, forced_board] > 0
+        if anywhere:
+            is_forced[:] = False
+            anywhere = False
+        counts[is_forced] *= boards == forced_board[is_forced, None]
+        totals = counts.sum(axis=1)
+        if not totals.all():
+            # nothing left to play: the game is over
+            playing = totals > 0
+            live, occupied, counts, totals = \
+                live[playing], occupied[playing], counts[playing], totals[playing]
+            games = games[:live.size]
+            if not live.size:
+                break
+
+        # uniform over the valid cells: pick the board, then the free cell in it
+        choice_index = (tables["rng"].random(live.size) * totals).astype(np.int64)
+        cumulative = counts.cumsum(axis=1)
+        big = (cumulative <= choice_index[:, None]).sum(axis=1)
+        nth = choice_index - cumulative[games, big] + counts[games, big]
+        small = tables["nth_free"][occupied[games, big], nth]
+
+        grid = grids[player, live, big] | tables["small_bits"][small]
+        won = has_won[grid]
+        grids[player, live, big] = np.where(won, 0b111111111, grid)
+        grids[1 - player, live[won], big[won]] = 0
+        macros[player, live[won]] |= tables["small_bits"][big[won]]
+        forced[live] = small
+        live = live[~tables["is_terminal"][macros[0, live] << 9 | macros[1, live]]]
+        player = 1 - player
+
+    return macros[0], macros[1]
+
 C = .6
 @lru_cache
 def calculate_utc(score: int, visited_count: int, parent_visited_count: int) -> float:
@@ -298,195 +648,1444 @@ def calculate_utc(score: int, visited_count: int, parent_visited_count: int) ->
     return (score/visited_count) \
             + C * sqrt(log(parent_visited_count)/visited_count)
 
+# search with RAVE in main(): all moves as first statistics blended into UTC
+RAVE = False
+# visits at which beta, the weight of the AMAF value, has dropped to one half
+RAVE_EQUIVALENCE = 300
+def calculate_rave_utc(score: int, visited_count: int, amaf_score: int, amaf_count: int,
+                       parent_visited_count: int) -> float:
+    """Return the UTC value of this node with its value blended with its all
+    moves as first (AMAF) value, by beta = sqrt(k / (3 n + k)) as in Gelly and
+    Silver's hand selected schedule, k being RAVE_EQUIVALENCE.
+
+    """
+    value = score / visited_count
+    if amaf_count:
+        beta = sqrt(RAVE_EQUIVALENCE / (3 * visited_count + RAVE_EQUIVALENCE))
+        value += beta * (amaf_score / amaf_count - value)
+    return value + C * sqrt(log(parent_visited_count)/visited_count)
+
+# Codingame turn budgets in seconds, and the share of them we keep back
+# (the first turn margin covers the interpreter start and the imports before
+# PROCESS_BEGIN_NS, about 45 ms)
+FIRST_TURN_TIME = 1
+FIRST_TURN_MARGIN = .1
+TURN_TIME = .1
+TURN_MARGIN = .005
+CHECK_INTERVAL_NS = 1_000_000
+# share of the search time a stable root is searched for, only a root whose
+# two most visited moves disagree spends the rest
+STABLE_SHARE = .8
+# turns of measured overrun the time manager keeps back for
+OVERRUN_TURNS = 10
+# search the tree in main() while the opponent thinks, for at most PONDER_TIME.
+# Pondering looks at stdin every check of its deadline: the next turn starts
+# its clock at the last look that found nothing (INPUT_IDLE_NS), so the time
+# a move waits for the search to notice it is charged to that turn
+PONDER = True
+PONDER_TIME = 2
+class Deadline():
+    """Low overhead deadline for the search loop, on the monotonic perf_counter_ns.
+    check() tells how many iterations may run before the clock has to be read
+    again. That stride follows the measured cost of an iteration, so the checks
+    get closer as the deadline nears and the search stops at most about one
+    iteration late.
+
+    """
+    def __init__(self, run_time: float) -> None:
+        self.end = time.perf_counter_ns() + int(run_time * 1_000_000_000)
+        self.checks = 0
+        self.iteration_ns = 0
+        self._last = 0
+        self._stride = 0
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline."""
+        return max(0, self.end - time.perf_counter_ns()) / 1_000_000_000
+
+    def check(self) -> int:
+        """Read the clock. Returns the iterations to run before the next check,
+        0 once the deadline has passed.
+
+        """
+        now = time.perf_counter_ns()
+        self.checks += 1
+        remaining = self.end - now
+        if remaining <= 0:
+            return 0
+        if self._stride:
+            # slowly forget an expensive iteration, but never underestimate
+            self.iteration_ns = max(
+                (now - self._last) // self._stride,
+                self.iteration_ns - (self.iteration_ns >> 3)
+            )
+            self._stride = max(
+                1, min(remaining >> 2, CHECK_INTERVAL_NS) // (self.iteration_ns or 1)
+            )
+        else:
+            self._stride = 1
+        self._last = now
+        return self._stride
+
+class TimeManager():
+    """Search time of each turn on the clock of the referee, which runs from
+    the arrival of the opponent's move to our answer. The margin is never
+    searched, and neither is the worst overrun of the last turns: the time
+    the answer took beyond the search time it was given (ending the search,
+    re-rooting, printing the move).
+    The measured latency of every turn is kept in `latencies` and logged, and
+    `answered` is the perf_counter_ns of the last answer.
+
+    """
+    def __init__(self) -> None:
+        self.latencies = []
+        self.overruns = []
+        self.answered = 0
+        self._begin = 0
+        self._end = 0
+        self._planned = 0
+
+    def start(self, turn_time: float, margin: float, begin_ns: int = None) -> None:
+        """Start the clock of a turn, now or at begin_ns."""
+        self._begin = time.perf_counter_ns() if begin_ns is None else begin_ns
+        self._end = self._begin + int((turn_time - margin) * 1_000_000_000)
+        self._planned = 0
+
+    def search_time(self) -> float:
+        """Seconds the search of this turn may take."""
+        now = time.perf_counter_ns()
+        end = self._end - max(self.overruns[-OVERRUN_TURNS:], default=0)
+        self._planned = max(now, end)
+        return (self._planned - now) / 1_000_000_000
+
+    def stop(self) -> float:
+        """Stop the clock once the move is out. Returns the latency in seconds."""
+        now = time.perf_counter_ns()
+        if self._planned:
+            self.overruns.append(max(0, now - self._planned))
+        self.answered = now
+        latency = (now - self._begin) / 1_000_000_000
+        self.latencies.append(latency)
+        print(f"latency {latency * 1000:.1f} ms, "
+              f"overrun {self.overruns[-1] / 1_000_000 if self.overruns else 0:.2f} ms",
+              file=sys.stderr, flush = True)
+        return latency
+
+# perf_counter_ns of the last look at stdin that found no input: a line found
+# there later arrived after it
+INPUT_IDLE_NS = 0
+
+def input_waiting() -> bool:
+    """Whether a line of input is there to read without waiting."""
+    global INPUT_IDLE_NS
+    try:
+        waiting = bool(select.select([sys.stdin], [], [], 0)[0])
+    except (OSError, ValueError): # not a selectable stream
+        waiting = False
+    if not waiting:
+        INPUT_IDLE_NS = time.perf_counter_ns()
+    return waiting
+
+class InputDeadline(Deadline):
+    """Deadline of the search while the opponent thinks: it also passes as soon
+    as a line of input arrives. Lines the referee sent must not wait in the
+    buffer of sys.stdin, as with the one turn at a time of Codingame.
+
+    """
+    def check(self) -> int:
+        if input_waiting():
+            return 0
+        return super().check()
+
+class IterationDeadline(Deadline):
+    """Deadline that also passes after a number of iterations, for searches
+    that should not depend on the clock, as in the benchmarks.
+
+    """
+    def __init__(self, run_time: float, iterations: int) -> None:
+        super().__init__(run_time)
+        self.left = iterations
+
+    def check(self) -> int:
+        stride = min(super().check(), self.left)
+        self.left -= stride
+        return stride
+
+def forced_board(state: tuple) -> int:
+    """The board the next move of state is forced to, 9 if it may go anywhere."""
+    board_1, board_2, move, _ = state
+    if move is not None \
+            and (board_1 | board_2) >> 9 * (move % 9) & 0b111111111 != 0b111111111:
+        return move % 9
+    return 9
+
+# Proven values of the MCTS-Solver, for the player who made the move of a node
+UNPROVEN, LOSS, DRAW, WIN = 0, 1, 2, 3
+# a proven win is the best move, a proven loss the worst
+PROOF_RANK = (1, 0, 1, 2)
+def terminal_value(state: tuple) -> int:
+    """Proven value of a finished game for the player who made its last move.
+    Without a line of boards the player who won the most boards wins.
+
+    """
+    board_1, board_2, _, is_player_1 = state
+    mine, theirs = (board_1 >> 81, board_2 >> 81) if is_player_1 \
+        else (board_2 >> 81, board_1 >> 81)
+    if HAS_WON[mine]:
+        return WIN
+    if HAS_WON[theirs]:
+        return LOSS
+    if mine.bit_count() == theirs.bit_count():
+        return DRAW
+    return WIN if mine.bit_count() > theirs.bit_count() else LOSS
+
+# Zobrist keys: a random 64-bit number per bit of either board (cells and macro
+# boards), per forced board and for player 2 to move. The key of a position is
+# the XOR of the numbers of everything in it, so move orders that reach the
+# same position get the same key. A fixed seed keeps keys the same across runs.
+ZOBRIST_RANDOM = Random(0x5eed)
+ZOBRIST_BITS = [ZOBRIST_RANDOM.getrandbits(64) for _ in range(2 * 90)]
+ZOBRIST_FORCED = [ZOBRIST_RANDOM.getrandbits(64) for _ in range(10)]
+ZOBRIST_PLAYER_2 = ZOBRIST_RANDOM.getrandbits(64)
+
+def zobrist_bits(key: int, bits: int, offset: int) -> int:
+    """XOR the Zobrist numbers of the set bits of a board into key."""
+    while bits:
+        low = bits & -bits
+        key ^= ZOBRIST_BITS[offset + low.bit_length() - 1]
+        bits ^= low
+    return key
+
+def zobrist_key(state: tuple) -> int:
+    """Zobrist key of state, computed from scratch."""
+    key = ZOBRIST_FORCED[forced_board(state)]
+    if state[3]:
+        key ^= ZOBRIST_PLAYER_2
+    return zobrist_bits(zobrist_bits(key, state[0], 0), state[1], 90)
+
+def next_key(key: int, state: tuple, child: tuple) -> int:
+    """Zobrist key of child, the state after a move in state with Zobrist key key.
+    Only the cells that changed are XORed: the cell played, or the whole board
+    and its macro bit on a capture.
+
+    """
+    key ^= ZOBRIST_PLAYER_2 ^ ZOBRIST_FORCED[forced_board(state)] \
+        ^ ZOBRIST_FORCED[forced_board(child)]
+    return zobrist_bits(zobrist_bits(key, state[0] ^ child[0], 0), state[1] ^ child[1], 90)
+
+# The 8 symmetries of the square (identity, rotations by 90, 180 and 270
+# degrees, then the mirrors: left-right, top-bottom, main and anti diagonal)
+# as the new index of each cell of a 3x3 grid. They move the boards of the
+# macro grid and the cells within every board at the same time.
+SYMMETRY_CELLS = [
+    [3 * row + col for row in range(3) for col in range(3)],
+    [3 * col + 2 - row for row in range(3) for col in range(3)],
+    [3 * (2 - row) + 2 - col for row in range(3) for col in range(3)],
+    [3 * (2 - col) + row for row in range(3) for col in range(3)],
+    [3 * row + 2 - col for row in range(3) for col in range(3)],
+    [3 * (2 - row) + col for row in range(3) for col in range(3)],
+    [3 * col + row for row in range(3) for col in range(3)],
+    [3 * (2 - col) + 2 - row for row in range(3) for col in range(3)],
+]
+# the symmetry undoing each one
+INVERSE_SYMMETRY = [
+    next(inverse for inverse in range(8)
+         if all(SYMMETRY_CELLS[inverse][SYMMETRY_CELLS[symmetry][cell]] == cell
+                for cell in range(9)))
+    for symmetry in range(8)
+]
+# every 9-bit board under each symmetry, cell small at bit 8 - small
+SYMMETRY_BOARDS = [
+    array('H', (sum(1 << 8 - cells[small] for small in range(9) if board >> 8 - small & 1)
+                for board in range(0b1000000000)))
+    for cells in SYMMETRY_CELLS
+]
+
+def transform_cell(cell: int, symmetry: int) -> int:
+    """Cell cell of the 81 under symmetry."""
+    cells = SYMMETRY_CELLS[symmetry]
+    return 9 * cells[cell // 9] + cells[cell % 9]
+
+# where each board of the 81 cells goes under each symmetry, as a shift
+SYMMETRY_SHIFTS = [[9 * cells[big] for big in range(9)] for cells in SYMMETRY_CELLS]
+
+def transform_board(board: int, symmetry: int) -> int:
+    """Packed board (every cell and the macro board) under symmetry."""
+    boards = SYMMETRY_BOARDS[symmetry]
+    result = boards[board >> 81] << 81
+    for shift, target in zip(range(0, 81, 9), SYMMETRY_SHIFTS[symmetry]):
+        small = board >> shift & 0b111111111
+        if small:
+            result |= boards[small] << target
+    return result
+
+def transform_state(state: tuple, symmetry: int) -> tuple:
+    """Packed state under symmetry."""
+    board_1, board_2, move, is_player_1 = state
+    return transform_board(board_1, symmetry), transform_board(board_2, symmetry), \
+        None if move is None else transform_cell(move, symmetry), is_player_1
+
+def canonical_state(state: tuple) -> tuple[tuple, int]:
+    """The representative of the position of state among its 8 symmetries:
+    the one with the smallest boards, then forced board. Returns it and the
+    symmetry that maps state to it.
+
+    """
+    # board_1 mostly decides alone, board_2 is only needed for the ties
+    images = [transform_board(state[0], symmetry) for symmetry in range(8)]
+    smallest = min(images)
+    best = None
+    best_symmetry = 0
+    for symmetry in range(8):
+        if images[symmetry] == smallest:
+            image = smallest, transform_board(state[1], symmetry), \
+                None if state[2] is None else transform_cell(state[2], symmetry), state[3]
+            order = image[1], forced_board(image)
+            if best is None or order < best[0]:
+                best = order, image
+                best_symmetry = symmetry
+    return best[1], best_symmetry
+
+def canonical_key(state: tuple) -> int:
+    """Zobrist key shared by the 8 symmetries of the position of state."""
+    return zobrist_key(canonical_state(state)[0])
+
+def unique_moves(state: tuple) -> list[int]:
+    """Valid moves of state, only one of those the symmetries of the position
+    map onto each other.
+
+    """
+    position = state[0], state[1], forced_board(state)
+    symmetries = []
+    for symmetry in range(1, 8):
+        image = transform_state(state, symmetry)
+        if (image[0], image[1], forced_board(image)) == position:
+            symmetries.append(symmetry)
+    moves = get_valid_moves(state)
+    if not symmetries:
+        return moves
+    return [move for move in moves
+            if all(transform_cell(move, symmetry) >= move for symmetry in symmetries)]
+
+# BEGIN GENERATED BOOK (python generate_book.py)
+# 22 positions of 3 plies, searched 120 s each
+BOOK_DIGITS = (
+    "08fe256ec3ac5b9b04136669f71dbd027048206407360a6e13d44725da65a17a"
+    "0d55122827a3248a43469a9e1e4003f19e40e975ec386957cd0f440a601e246f"
+    "03d7f4a0d7f64d1073daa3e5f81dbd7b4574d4e512bf4df2383077f1884a101c"
+    "3295247ff46b2da13ebb994a89039ad2dfbf1bd03c8a724a4f10aed76f419a7a"
+    "a557aa9aefad1da0640cc62963adff25adf198cb1fec055017afdebcca40b748"
+    "2349ce417519844b98204cdc4b175fff4fa52e46e4b0fc5a7431dc612afd0cf7"
+    "4ab29e300a01"
+)
+# END GENERATED BOOK
+
+def read_book(digits: str) -> dict[int, int]:
+    """Opening book from its digits: 16 hex digits of the Zobrist key of a
+    position, then 2 of the move to play in it.
+
+    """
+    return {int(digits[index:index + 16], 16): int(digits[index + 16:index + 18], 16)
+            for index in range(0, len(digits), 18)}
+OPENING_BOOK = read_book(BOOK_DIGITS)
+
+# entries of the transposition table of the search, 0 searches a plain tree
+TRANSPOSITIONS = 0
+class TranspositionTable():
+    """Bounded map from Zobrist keys to the node that holds the statistics of
+    the position. Entries live in buckets of two slots: a new position takes an
+    empty slot, or replaces the entry with the fewest visits.
+
+    """
+    def __init__(self, capacity: int) -> None:
+        buckets = max(2, capacity // 2)
+        while any(buckets % divisor == 0 for divisor in range(2, int(sqrt(buckets)) + 1)):
+            buckets -= 1
+        self.buckets = buckets
+        capacity = self.capacity = 2 * buckets
+        self.keys = [None] * capacity
+        self.nodes = array('i', [-1]) * capacity
+        self.hits = 0
+        self.replaced = 0
+
+    def clear(self) -> None:
+        """Forget every entry."""
+        self.keys = [None] * self.capacity
+        self.nodes = array('i', [-1]) * self.capacity
+
+    def lookup(self, key: int, node: int, visits: array) -> int:
+        """Return the node stored for key, or store node for it and return node."""
+        keys = self.keys
+        slot = 2 * (hash(key) % self.buckets)
+        if keys[slot] == key:
+            self.hits += 1
+            return self.nodes[slot]
+        if keys[slot + 1] == key:
+            self.hits += 1
+            return self.nodes[slot + 1]
+        if keys[slot] is not None and (keys[slot + 1] is None \
+                or visits[self.nodes[slot + 1]] < visits[self.nodes[slot]]):
+            slot += 1
+        if keys[slot] is not None:
+            self.replaced += 1
+        keys[slot] = key
+        self.nodes[slot] = node
+        return node
+
+POOL_CAPACITY = 1 << 18
+class NodePool():
+    """Preallocated struct-of-arrays storage for the search tree.
+    Nodes are integer indexes. The children of a node are allocated together
+    in one contiguous block when it is expanded, in a random order, and
+    visited in that order: the first `expanded[node]` of them have a state.
+    With a transposition table the tree is a DAG: a node visited for a position
+    that is already in the table only links to the node of that position, which
+    holds the statistics for both (`shared[node]`) and is searched instead.
+    With rave every node also counts the games in which its move was played
+    later on by the same player (all moves as first), 8 more bytes a node.
+    Finished games and nodes whose children decide them are proven
+    (`proven[node]`, see terminal_value) and no longer searched.
+    The key of a node is the Zobrist key of its position, canonical_key with a
+    transposition table so symmetric positions share their node too.
+
+    """
+    def __init__(self, capacity: int = POOL_CAPACITY, transpositions: int = 0,
+                 rave: bool = False) -> None:
+        self.capacity = capacity
+        self.visits = array('i', [0]) * capacity
+        self.scores = array('i', [0]) * capacity
+        self.parents = array('i', [-1]) * capacity
+        self.first_child = array('i', [-1]) * capacity
+        self.child_count = array('B', [0]) * capacity
+        self.expanded = array('B', [0]) * capacity
+        self.moves = array('b', [-1]) * capacity
+        self.states = [None] * capacity
+        self.keys = array('Q', [0]) * capacity
+        self.proven = array('B', [UNPROVEN]) * capacity
+        self.amaf_visits = array('i', [0]) * capacity if rave else None
+        self.amaf_scores = array('i', [0]) * capacity if rave else None
+        self.shared = array('i', range(capacity))
+        self.table = TranspositionTable(transpositions) if transpositions else None
+        # nodes linked to the node of their position
+        self.links = []
+        self.size = 0
+
+    def clear(self, start: int, end: int) -> None:
+        """Free the slots from start to end in bulk."""
+        size = end - start
+        self.visits[start:end] = array('i', [0]) * size
+        self.scores[start:end] = array('i', [0]) * size
+        self.first_child[start:end] = array('i', [-1]) * size
+        self.expanded[start:end] = array('B', [0]) * size
+        self.states[start:end] = [None] * size
+        self.proven[start:end] = array('B', [UNPROVEN]) * size
+        self.shared[start:end] = array('i', range(start, end))
+        if self.amaf_visits is not None:
+            self.amaf_visits[start:end] = array('i', [0]) * size
+            self.amaf_scores[start:end] = array('i', [0]) * size
+
+    def reset(self) -> None:
+        """Forget every node. Only the slots in use are cleared."""
+        self.clear(0, self.size)
+        self.size = 0
+        self.links.clear()
+        if self.table is not None:
+            self.table.clear()
+
+    def unlink(self) -> None:
+        """Turn the linked nodes into leaves with a copy of their shared statistics."""
+        shared = self.shared
+        for node in self.links:
+            self.visits[node] = self.visits[shared[node]]
+            self.scores[node] = self.scores[shared[node]]
+            self.proven[node] = self.proven[shared[node]]
+            shared[node] = node
+        self.links.clear()
+
+    def compact(self, node: int) -> int:
+        """Keep only the subtree of node, moved to the front of the pool with
+        node as the root at index 0, and free every other slot in bulk.
+        Returns the number of nodes retained.
+
+        """
+        # links may point out of the subtree, the table is rebuilt below
+        self.unlink()
+        old_visits = self.visits
+        old_scores = self.scores
+        old_counts = self.child_count
+        old_visited = self.expanded
+        old_moves = self.moves
+        old_states = self.states
+        old_keys = self.keys
+        old_proven = self.proven
+        old_amaf_visits = self.amaf_visits
+        old_amaf_scores = self.amaf_scores
+        rave = old_amaf_visits is not None
+        first_child = self.first_child
+        # copied breadth first, block by block, so children stay contiguous
+        visits = array('i', [old_visits[node]])
+        scores = array('i', [old_scores[node]])
+        counts = array('B', [old_counts[node]])
+        visited = array('B', [old_visited[node]])
+        moves = array('b', [old_moves[node]])
+        states = [old_states[node]]
+        keys = array('Q', [old_keys[node]])
+        proven = array('B', [old_proven[node]])
+        if rave:
+            amaf_visits = array('i', [old_amaf_visits[node]])
+            amaf_scores = array('i', [old_amaf_scores[node]])
+        firsts = array('i', [-1])
+        parents = array('i', [-1])
+        unvisited = array('i', [-1]) * 81
+        queue = [(0, node)] if first_child[node] >= 0 else []
+        for new_node, old_node in queue:
+            first = first_child[old_node]
+            end = first + old_counts[old_node]
+            new_first = len(states)
+            firsts[new_node] = new_first
+            visits += old_visits[first:end]
+            scores += old_scores[first:end]
+            counts += old_counts[first:end]
+            visited += old_visited[first:end]
+            moves += old_moves[first:end]
+            states += old_states[first:end]
+            keys += old_keys[first:end]
+            proven += old_proven[first:end]
+            if rave:
+                amaf_visits += old_amaf_visits[first:end]
+                amaf_scores += old_amaf_scores[first:end]
+            firsts += unvisited[:end - first]
+            parents += array('i', [new_node]) * (end - first)
+            # only children with children of their own need a visit
+            queue.extend(
+                (new_first + child - first, child)
+                for child in range(first, first + old_visited[old_node])
+                if first_child[child] >= 0
+            )
+
+        size = len(states)
+        self.visits[:size] = visits
+        self.scores[:size] = scores
+        self.child_count[:size] = counts
+        self.expanded[:size] = visited
+        self.moves[:size] = moves
+        self.states[:size] = states
+        self.keys[:size] = keys
+        self.proven[:size] = proven
+        if rave:
+            self.amaf_visits[:size] = amaf_visits
+            self.amaf_scores[:size] = amaf_scores
+        self.first_child[:size] = firsts
+        self.parents[:size] = parents
+        self.shared[:size] = array('i', range(size))
+        if size < self.size:
+            self.clear(size, self.size)
+        self.size = size
+        if self.table is not None:
+            self.table.clear()
+            for node in range(size):
+                if states[node] is not None:
+                    self.table.lookup(keys[node], node, self.visits)
+        return size
+
+    def add_root(self, state: tuple) -> int:
+        """Allocate a visited node without parent for state."""
+        node = self.size
+        self.size += 1
+        self.parents[node] = -1
+        self.moves[node] = -1 if state[2] is None else state[2]
+        self.child_count[node] = 0
+        self.states[node] = state
+        self.keys[node] = zobrist_key(state) if self.table is None else canonical_key(state)
+        self.visits[node] = 1
+        return node
+
+    def expand(self, node: int, symmetric: bool = False) -> bool:
+        """Allocate the children of node, with symmetric only one of the moves
+        the symmetries of the position map onto each other. Returns False when
+        the pool is full. A finished game gets no children and its proven value.
+
+        """
+        state = self.states[node]
+        moves = [] if IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81] \
+            else unique_moves(state) if symmetric else get_valid_moves(state)
+        if not moves:
+            self.proven[node] = terminal_value(state)
+        first = self.size
+        if first + len(moves) > self.capacity:
+            return False
+        self.size += len(moves)
+        self.first_child[node] = first
+        self.child_count[node] = len(moves)
+        self.parents[first:self.size] = array('i', [node]) * len(moves)
+        # ordered by random keys: one C random() per child, where shuffle
+        # draws each index through getrandbits in Python
+        self.moves[first:self.size] = array('b', sorted(moves, key=lambda _: random()))
+        return True
+
+    def visit(self, node: int, child: int) -> int:
+        """Visit the unvisited child of node: move it to the front of the
+        unvisited children and give it a state. Returns its new index.
+
+        """
+        first = self.first_child[node] + self.expanded[node]
+        if child != first:
+            # keep the unvisited children at the end of the block
+            self.moves[child], self.moves[first] = self.moves[first], self.moves[child]
+        self.expanded[node] += 1
+        state = self.states[first] = next_state(self.states[node], self.moves[first])
+        self.visits[first] = 1
+        if IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81]:
+            self.proven[first] = terminal_value(state)
+        if self.table is None:
+            self.keys[first] = next_key(self.keys[node], self.states[node], state)
+        else:
+            key = self.keys[first] = canonical_key(state)
+            shared = self.table.lookup(key, first, self.visits)
+            if shared != first:
+                self.shared[first] = shared
+                self.links.append(first)
+        return first
+
+    def prove(self, node: int) -> int:
+        """Prove node from its children if they decide it: a child winning for
+        the player to move is a loss for node, and once every child is proven
+        node takes the opposite of the best of them. Returns the proven value.
+
+        """
+        first = self.first_child[node]
+        if first < 0 or not self.child_count[node]:
+            return self.proven[node]
+        shared = self.shared
+        values = [self.proven[shared[child]]
+                  for child in range(first, first + self.expanded[node])]
+        if WIN in values:
+            value = LOSS
+        elif UNPROVEN in values or len(values) < self.child_count[node]:
+            return UNPROVEN
+        else:
+            value = WIN + LOSS - max(values)
+        self.proven[node] = value
+        return value
+
+class SolverTimeout(Exception):
+    """The endgame solver ran out of time."""
+
+# empty cells from which run() first solves the game exactly, 0 never does
+ENDGAME_CELLS = 20
+# share of the turn the endgame solver may take before the search goes on
+ENDGAME_SHARE = .5
+# entries of the endgame solver table, it is cleared once it holds more
+ENDGAME_ENTRIES = 1 << 18
+# bounds of the values in the endgame solver table
+EXACT, LOWER, UPPER = 0, 1, 2
+class EndgameSolver():
+    """Exact alpha-beta (negamax) search of the end of the game, for the player
+    to move: 1 wins, 0 draws, -1 loses. Positions are memoized by Zobrist key,
+    with their value, its bound and their best move packed in one int, and
+    searched best move first, then the moves that win their board.
+
+    """
+    def __init__(self) -> None:
+        self.table = {}
+        self.nodes = 0
+        self.end = 0
+        # nodes between clock checks less one, a power of two
+        self.check_mask = 0x3ff
+        self.until_input = False
+
+    def search(self, state: tuple, key: int, alpha: int, beta: int) -> int:
+        """Value of state within alpha and beta. Raises SolverTimeout once the
+        clock passes self.end, or with until_input once a line of input arrives.
+
+        """
+        self.nodes += 1
+        if not self.nodes & self.check_mask and (time.perf_counter_ns() > self.end
+                                                 or self.until_input and input_waiting()):
+            raise SolverTimeout
+        board_1, board_2, _, is_player_1 = state
+        if IS_TERMINAL[(board_1 >> 81) << 9 | board_2 >> 81]:
+            return DRAW - terminal_value(state)
+        moves = get_valid_moves(state)
+        if not moves:
+            return DRAW - terminal_value(state)
+
+        first = -1
+        entry = self.table.get(key)
+        if entry is not None:
+            value = (entry & 3) - 1
+            bound = entry >> 2 & 3
+            if bound == EXACT:
+                return value
+            if bound == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+            first = entry >> 4
+
+        own = board_2 if is_player_1 else board_1
+        ordered = [first] if first >= 0 else []
+        rest = []
+        for move in moves:
+            if move != first:
+                big = move // 9
+                if WINNING_CELLS[own >> 9 * big & 0b111111111] & CELL_BITS[move] >> 9 * big:
+                    ordered.append(move)
+                else:
+                    rest.append(move)
+        ordered += rest
+
+        start = alpha
+        best = -2
+        best_move = first
+        for move in ordered:
+            child = next_state(state, move)
+            value = -self.search(child, next_key(key, state, child), -beta, -alpha)
+            if value > best:
+                best = value
+                best_move = move
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        bound = UPPER if best <= start else LOWER if best >= beta else EXACT
+        self.table[key] = best_move << 4 | bound << 2 | best + 1
+        return best
+
+    def solve(self, pool: NodePool, root: int, end: int, until_input: bool = False) -> None:
+        """Prove the children of root exactly, until one wins or the clock
+        passes end (perf_counter_ns), or with until_input a line of input
+        arrives: pondering must hand the opponent's move over at once, the
+        clock of the turn runs from its arrival. The proofs are kept on timeout.
+
+        """
+        if len(self.table) > ENDGAME_ENTRIES:
+            self.table.clear()
+        self.end = end
+        self.until_input = until_input
+        # about 1.5 ms of search between the checks of the input, 7 ms of the clock
+        self.check_mask = 0xff if until_input else 0x3ff
+        if pool.first_child[root] < 0 and not pool.expand(root):
+            return
+        first = pool.first_child[root]
+        while pool.expanded[root] < pool.child_count[root]:
+            pool.visit(root, first + pool.expanded[root])
+        try:
+            for child in range(first, first + pool.child_count[root]):
+                node = pool.shared[child]
+                if not pool.proven[node]:
+                    state = pool.states[node]
+                    value = self.search(state, zobrist_key(state), -1, 1)
+                    # the value is for the player after the move of node
+                    pool.proven[node] = DRAW - value
+                if pool.proven[node] == WIN:
+                    break
+        except SolverTimeout:
+            pass
+        pool.prove(root)
+
+# log the telemetry of every search to stderr, as "text" or "json" (one line)
+TELEMETRY = False
+TELEMETRY_FORMAT = "text"
+# root children listed in the text line, most visited first
+TELEMETRY_CHILDREN = 5
+class SearchStats():
+    """Telemetry of one UltimateBoard.run: iterations and rollouts, depth of
+    the selected nodes, nodes allocated, the visits the root kept from the
+    turn before, the visits of its children, and the wall time of each phase.
+    The expansion and the rollout are timed by wrappers, the rest by marks at
+    the start of an iteration and before its rollout: without telemetry the
+    search only tests for None twice per iteration.
+
+    """
+    def __init__(self, board: UltimateBoard, label: str = "search") -> None:
+        pool = board.pool
+        self.label = label
+        self.board = board
+        self.begin = time.perf_counter_ns()
+        self.size = pool.size
+        self.reused = sum(board.root_statistics()[1])
+        self.iterations = 0
+        self.rollouts = 0
+        self.depth_total = 0
+        self.depth_max = 0
+        self.solve_ns = 0
+        self.select_ns = 0
+        self.expand_ns = 0
+        self.simulate_ns = 0
+        self.backprop_ns = 0
+        self._start = 0
+        self._leaf = 0
+
+    def timed(self, function, phase: str):
+        """Wrap function to add its run time to the phase counter."""
+        def wrapper(*args):
+            begin = time.perf_counter_ns()
+            result = function(*args)
+            setattr(self, phase, getattr(self, phase) + time.perf_counter_ns() - begin)
+            return result
+        return wrapper
+
+    def start(self) -> None:
+        """Mark the start of an iteration, and the end of the one before."""
+        now = time.perf_counter_ns()
+        if self._leaf:
+            self.backprop_ns += now - self._leaf
+            self._leaf = 0
+        self._start = now
+
+    def leaf(self, node: int, batch: int, jumps: list[int] = ()) -> None:
+        """Mark the end of the selection at node, before its rollout. Its depth
+        is counted along the path the selection took, back through the linked
+        nodes of jumps as the backpropagation goes.
+
+        """
+        self.select_ns += time.perf_counter_ns() - self._start
+        pool = self.board.pool
+        root = self.board.root
+        depth = 0
+        pending = len(jumps)
+        while node != root and node >= 0 and depth < 81:
+            if pending and node == pool.shared[jumps[pending - 1]]:
+                pending -= 1
+                node = jumps[pending]
+            node = pool.parents[node]
+            depth += 1
+        self.iterations += 1
+        self.rollouts += batch
+        self.depth_total += depth
+        self.depth_max = max(self.depth_max, depth)
+        # the telemetry itself counts in no phase
+        self._leaf = time.perf_counter_ns()
+
+    def report(self) -> dict:
+        """The telemetry of the search, once it is over."""
+        self.start()
+        wall = time.perf_counter_ns() - self.begin
+        moves, visits, _ = self.board.root_statistics()
+        # the wrapped expansion and rollout ran inside the marks
+        simulate = self.simulate_ns
+        return {
+            "label": self.label,
+            "iterations": self.iterations,
+            "rollouts_per_s": round(self.rollouts * 1e9 / wall) if wall else 0,
+            "depth_max": self.depth_max,
+            "depth_mean": round(self.depth_total / self.iterations, 2) if self.iterations else 0,
+            "allocated": self.board.pool.size - self.size,
+            "reused": self.reused,
+            "visits": sorted(zip(visits, moves), reverse=True),
+            "ms": {
+                "solve": self.solve_ns / 1e6,
+                "select": (self.select_ns - self.expand_ns) / 1e6,
+                "expand": self.expand_ns / 1e6,
+                "simulate": simulate / 1e6,
+                "backprop": (self.backprop_ns - simulate) / 1e6,
+                "wall": wall / 1e6,
+            },
+        }
+
+    def log(self) -> None:
+        """Write the telemetry to stderr on one line."""
+        report = self.report()
+        if TELEMETRY_FORMAT == "json":
+            # json and the re it imports would add 8 ms to every first turn
+            import json
+            line = json.dumps(report, separators=(",", ":"))
+        else:
+            visits = "/".join(str(visits) for visits, _ in report["visits"][:TELEMETRY_CHILDREN])
+            times = " ".join(f"{phase} {ms:.1f}" for phase, ms in report["ms"].items())
+            line = (f"{report['label']} {report['iterations']} it "
+                    f"{report['rollouts_per_s']}/s depth {report['depth_mean']}/"
+                    f"{report['depth_max']} nodes +{report['allocated']} "
+                    f"reused {report['reused']} visits {visits or '-'} ms {times}")
+        print(line, file=sys.stderr, flush = True)
+
 class UltimateBoard():
-    """Class for Ultimate TicTacToe board."""
+    """Class for Ultimate TicTacToe board, searched with Monte Carlo over a NodePool."""
     def __init__(self,
             is_player_1: bool = False,
-            move: tuple[int] = None,
-            parent: UltimateBoard = None
+            move: int = None,
+            pool: NodePool = None,
+            batch: int = 0,
+            heavy: bool = False,
+            endgame: int = 0
         ) -> None:
-        self.visited_count = 1
-        self.score = 0
-        self.parent = parent
-        self.unvisited_actions = []
-        self.children = {}
-        self.children_refs = []
-
-        self.is_player_1 = is_player_1
-        if parent is None:
-            self.grid_player_1 = [0b000000000 for _ in range(9)]
-            self.grid_player_2 = [0b000000000 for _ in range(9)]
-            self.player_1 = 0b000000000
-            self.player_2 = 0b000000000
-        else:
-            self.grid_player_1 = parent.grid_player_1[:]
-            self.grid_player_2 = parent.grid_player_2[:]
-            self.player_1 = parent.player_1
-            self.player_2 = parent.player_2
+        self.pool = NodePool() if pool is None else pool
+        # rollouts per leaf, played by simulate_batch if more than one
+        self.batch = batch
+        # single rollouts are played by simulate_heavy instead of simulate
+        self.heavy = heavy
+        # empty cells from which the endgame is solved exactly before the search
+        self.endgame = endgame
+        self.solver = EndgameSolver() if endgame else None
+        self.root = self.pool.add_root(next_state((0, 0, None, not is_player_1), move))
 
-        self.move = move
-        self.play()
+    @classmethod
+    def from_state(cls, state: tuple, pool: NodePool = None, batch: int = 0,
+                   heavy: bool = False, endgame: int = 0) -> UltimateBoard:
+        """Board searching from a packed state instead of an opening move."""
+        board = cls.__new__(cls)
+        board.pool = NodePool() if pool is None else pool
+        board.batch = batch
+        board.heavy = heavy
+        board.endgame = endgame
+        board.solver = EndgameSolver() if endgame else None
+        board.root = board.pool.add_root(state)
+        return board
 
     @property
-    def utc(self) -> float:
-        """Return hopefully cached UTC."""
-        return calculate_utc(self.score, self.visited_count, self.parent.visited_count)
+    def state(self) -> tuple:
+        """Packed state of the root."""
+        return self.pool.states[self.root]
+    @property
+    def is_player_1(self) -> bool:
+        """Whether player 1 made the root move."""
+        return self.state[3]
     @property
-    def next_child(self) -> UltimateBoard:
-        """Select the node with currently the highest utc value."""
-        return max(self.children_refs, key=lambda child: child.utc)
+    def move(self) -> int:
+        """Cell of the root move."""
+        return self.state[2]
     @property
-    def best_child(self) -> UltimateBoard:
-        """Select the node with currently the highest score per visit."""
-        return max(self.children_refs, key=lambda child: child.visited_count)
+    def best_child(self) -> int:
+        """Select the child of the root that was visited most, a proven win
+        before anything else and a proven loss only if every move loses.
 
-    def get_valid_actions(self) -> list[tuple[int]]:
+        """
+        pool = self.pool
+        first = pool.first_child[self.root]
+        visits = pool.visits
+        proven = pool.proven
+        shared = pool.shared
+        return max(range(first, first + pool.expanded[self.root]),
+                   key=lambda child: (PROOF_RANK[proven[shared[child]]], visits[shared[child]]))
+
+    def get_valid_actions(self) -> list[int]:
         """List of valid moves on this board."""
-        valid_actions = []
-
-        if self.move is not None:
-            index = SMALL_TO_BIG[self.move[1]]
-            if not IS_TERMINAL[self.grid_player_1[index]][self.grid_player_2[index]]:
-                valid_actions.extend(TRANSLATED_VALID_ACTIONS[index]\
-                        [self.grid_player_1[index] | self.grid_player_2[index]][:])
-
-        if not valid_actions:
-            for playable_board in VALID_ACTIONS[self.player_1 | self.player_2]:
-                index = SMALL_TO_BIG[playable_board]
-                valid_actions.extend(
-                    TRANSLATED_VALID_ACTIONS[index]\
-                        [self.grid_player_1[index] | self.grid_player_2[index]]
-                )
-
-        return valid_actions
-
-    def play(self) -> None:
-        """Play a given move on this board."""
-
-        if self.is_player_1:
-            self.grid_player_1[self.move[0]] |= self.move[1]
-            if HAS_WON[self.grid_player_1[self.move[0]]]:
-                self.player_1 |= BIG_TO_SMALL[self.move[0]]
-                self.grid_player_1[self.move[0]] = 0b111111111
-                self.grid_player_2[self.move[0]] = 0b000000000
+        return get_valid_moves(self.state)
+
+    def book_move(self) -> int:
+        """Move of the opening book for the root position, None if it has none.
+        The book holds one of each set of symmetric positions.
+
+        """
+        position, symmetry = canonical_state(self.state)
+        move = OPENING_BOOK.get(zobrist_key(position))
+        if move is None or move >= 81:
+            return None
+        move = transform_cell(move, INVERSE_SYMMETRY[symmetry])
+        return move if move in self.get_valid_actions() else None
+
+    def expand_root(self) -> None:
+        """Expand the root if it is not, with one of the moves the symmetries
+        of the position map onto each other, so they are searched once.
 
+        """
+        if self.pool.first_child[self.root] < 0:
+            self.pool.expand(self.root, symmetric=True)
+
+    def choose_move(self, run_time: float) -> int:
+        """Choose the move of the root, search for at most run_time and move the
+        root to it (without compaction). A stable root stops after STABLE_SHARE
+        of run_time, and a root with a single move to play is not searched.
+        A book move is played at once, without a search.
+        Returns the move.
+
+        """
+        move = self.book_move()
+        if move is None:
+            self.expand_root()
+            pool = self.pool
+            if pool.first_child[self.root] < 0:
+                # no room for the children of the root in the pool: a random move
+                moves = get_valid_moves(self.state)
+                move = moves[int(random() * len(moves))]
+                self.advance_root(move, compact=False)
+                return move
+            if pool.child_count[self.root] > 1:
+                self.run(run_time, STABLE_SHARE * run_time)
+            if not pool.expanded[self.root]:
+                # a forced move, or no time for a single iteration
+                pool.visit(self.root, pool.first_child[self.root])
+            move = pool.moves[self.best_child]
+            self.advance_root(move, compact=False)
         else:
-            self.grid_player_2[self.move[0]] |= self.move[1]
-            if HAS_WON[self.grid_player_2[self.move[0]]]:
-                self.player_2 |= BIG_TO_SMALL[self.move[0]]
-                self.grid_player_1[self.move[0]] = 0b000000000
-                self.grid_player_2[self.move[0]] = 0b111111111
-
-    def run(self, run_time: float) -> None:
-        """Run simulations until we run out of run_time"""
+            self.advance_root(move, compact=False)
+        return move
+
+    def compact(self) -> int:
+        """Free every node outside the subtree of the root, which moves to the
+        front of the pool. Returns the number of nodes retained.
+
+        """
+        retained = self.pool.compact(self.root)
+        self.root = 0
+        return retained
+
+    def advance_root(self, move: int, compact: bool = True) -> int:
+        """Move the root to its child for move, keeping its subtree and statistics.
+        With compact the subtree is moved to the front of the pool and the rest
+        of the tree is freed in bulk. Without it re-rooting is free, and the old
+        tree stays in the pool until the next compaction (or the pool is half full).
+        A pool with a transposition table always compacts: its links and table
+        entries may lead out of the subtree, into the tree left behind.
+        Returns the number of nodes retained, or in use without compaction.
+
+        """
+        pool = self.pool
+        root = self.root
+        if pool.first_child[root] < 0 and not pool.expand(root):
+            state = next_state(self.state, move)
+            pool.reset()
+            self.root = pool.add_root(state)
+            return 1
+
+        first = pool.first_child[root]
+        for child in range(first, first + pool.child_count[root]):
+            if pool.moves[child] == move:
+                if child >= first + pool.expanded[root]:
+                    child = pool.visit(root, child)
+                if not compact and pool.table is None and pool.size <= pool.capacity // 2:
+                    self.root = child
+                    return pool.size
+                self.root = 0
+                return pool.compact(child)
+        if move in get_valid_moves(self.state):
+            # left out of a symmetric expansion, the tree only has a mirror of it
+            state = next_state(self.state, move)
+            pool.reset()
+            self.root = pool.add_root(state)
+            return 1
+        raise ValueError(f"invalid move {move}")
+
+    def ponder(self, limit: float = PONDER_TIME) -> int:
+        """Search the root, the position the opponent is thinking about, until
+        the opponent's move arrives on stdin (at most limit seconds). Every
+        reply is searched, and the next turn keeps the subtree of the move played.
+        Returns the number of iterations.
+
+        """
+        return self.run(limit, until_input=True)
+
+    def settled(self, deadline: Deadline, stable_end: int) -> bool:
+        """Whether the search of the root can stop before the deadline: the most
+        visited child keeps the most visits whatever the iterations left visit,
+        or stable_end (perf_counter_ns) is past and the root is stable, its most
+        visited child scoring at least as well as the runner-up.
+
+        """
+        pool = self.pool
+        visits = pool.visits
+        scores = pool.scores
+        shared = pool.shared
+        proven = pool.proven
+        first = pool.first_child[self.root]
+        best = second = -1
+        for child in range(first, first + pool.expanded[self.root]):
+            node = shared[child]
+            if proven[node] == LOSS:
+                continue
+            if best < 0 or visits[node] > visits[best]:
+                best, second = node, best
+            elif second < 0 or visits[node] > visits[second]:
+                second = node
+        if best < 0 or second < 0:
+            return False
+        now = time.perf_counter_ns()
+        left = (deadline.end - now) // (deadline.iteration_ns or 1) * max(1, self.batch)
+        if visits[best] - visits[second] > left:
+            return True
+        return now >= stable_end \
+            and scores[best] * visits[second] >= scores[second] * visits[best]
+
+    def run(self, run_time: float, stable_time: float = None, until_input: bool = False,
+            iterations: int = 0) -> int:
+        """Run simulations until we run out of run_time, or the root is proven.
+        With stable_time the search may stop early, see settled: once the best
+        move is decided, or after stable_time if the root is stable.
+        With until_input it stops when a line of input arrives as well, with
+        iterations once it ran that many.
+
+        """
+        pool = self.pool
+        visits = pool.visits
+        scores = pool.scores
+        parents = pool.parents
+        first_child = pool.first_child
+        child_count = pool.child_count
+        expanded = pool.expanded
+        states = pool.states
+        moves = pool.moves
+        shared = pool.shared
+        proven = pool.proven
+        transpositions = pool.table is not None
+        amaf_visits = pool.amaf_visits
+        amaf_scores = pool.amaf_scores
+        rave = amaf_visits is not None
+        # linked nodes whose shared node the selection went on from
+        jumps = []
+        root = self.root
+        batch = self.batch if self.batch > 1 else 0
+        rollout = simulate_heavy if self.heavy else simulate
+        batch_rollout = simulate_batch
+        expand = pool.expand
+        visit = pool.visit
+        if batch:
+            has_won = numpy_tables()["has_won"]
+            free_count = numpy_tables()["free_count"]
+        stats = SearchStats(self, "ponder" if until_input else "search") if TELEMETRY else None
+        if stats:
+            expand = stats.timed(expand, "expand_ns")
+            visit = stats.timed(visit, "expand_ns")
+            rollout = stats.timed(rollout, "simulate_ns")
+            batch_rollout = stats.timed(batch_rollout, "simulate_ns")
+
         count = 0
-        begin = datetime.datetime.now()
-        while (datetime.datetime.now() - begin).total_seconds() < run_time:
+        if until_input:
+            deadline = InputDeadline(run_time)
+        elif iterations:
+            deadline = IterationDeadline(run_time, iterations)
+        else:
+            deadline = Deadline(run_time)
+        stable_end = 0 if stable_time is None \
+            else deadline.end - int((run_time - stable_time) * 1_000_000_000)
+        if self.solver is not None and not proven[root] \
+                and (~(self.state[0] | self.state[1]) & CELLS_MASK).bit_count() <= self.endgame:
+            self.solver.solve(pool, root, deadline.end - int(
+                (1 - ENDGAME_SHARE) * deadline.remaining() * 1_000_000_000), until_input)
+            if stats:
+                stats.solve_ns = time.perf_counter_ns() - stats.begin
+        countdown = 1
+        # once the root is proven there is no need to search on
+        while not proven[root]:
+            if stats:
+                stats.start()
+            countdown -= 1
+            if not countdown:
+                countdown = deadline.check()
+                if not countdown or stable_end and self.settled(deadline, stable_end):
+                    break
+
             #selection
-            node = self
+            node = root
             while True:
-                if not node.unvisited_actions and not node.children:
-                    node.unvisited_actions.extend(node.get_valid_actions())
-                    if not node.unvisited_actions:
+                if first_child[node] < 0 and not expand(node):
+                    break
+                first = first_child[node]
+                children = child_count[node]
+                if not children:
+                    break
+                if expanded[node] < children:
+                    node = visit(node, first + expanded[node])
+                    if shared[node] != node:
+                        jumps.append(node)
+                        node = shared[node]
+                    break
+                parent_visits = visits[node]
+                if rave:
+                    utc = lambda child: calculate_rave_utc(
+                        scores[shared[child]], visits[shared[child]],
+                        amaf_scores[child], amaf_visits[child], parent_visits)
+                elif transpositions:
+                    utc = lambda child: calculate_utc(
+                        scores[shared[child]], visits[shared[child]], parent_visits)
+                else:
+                    utc = lambda child: calculate_utc(scores[child], visits[child], parent_visits)
+                child = max(range(first, first + children), key=utc)
+                if proven[shared[child]]:
+                    # proven children are decided, they need no more search
+                    unproven = [child for child in range(first, first + children)
+                                if not proven[shared[child]]]
+                    if not unproven:
+                        # proven through a transposition: prove node itself
+                        pool.prove(node)
                         break
-                    shuffle(node.unvisited_actions)
+                    child = max(unproven, key=utc)
+                node = child
+                if shared[node] != node:
+                    jumps.append(node)
+                    node = shared[node]
 
-                if node.unvisited_actions:
-                    action = node.unvisited_actions.pop()
-                    node.children[action] = UltimateBoard(not node.is_player_1, action, node)
-                    node.children_refs.append(node.children[action])
-                    node = node.children[action]
-                    break
-                node = node.next_child
+            # a finished game proves its parents in the backpropagation
+            solved = proven[node]
+            if stats:
+                stats.leaf(node, batch or 1, jumps)
 
             #simulation
-            simulation_board = UltimateBoard(node.is_player_1, node.move, node.parent)
-            player_1_score = 0
-            player_2_score = 0
-            visits = 1
-            depth = 0
-
-            while not IS_TERMINAL[simulation_board.player_1][simulation_board.player_2]:
-                depth += 1
-                actions = simulation_board.get_valid_actions()
-                if not actions:
-                    break
-                simulation_board.move = choice(actions)
-                simulation_board.play()
-                simulation_board.is_player_1 = not simulation_board.is_player_1
-
-            if self.is_player_1 == simulation_board.is_player_1:
-                tmp = int(HAS_WON[simulation_board.player_1] \
-                            or VALID_ACTIONS_LEN[simulation_board.player_1] < VALID_ACTIONS_LEN[simulation_board.player_2] \
-                        if simulation_board.is_player_1 \
-                        else HAS_WON[simulation_board.player_2] \
-                            or VALID_ACTIONS_LEN[simulation_board.player_1] > VALID_ACTIONS_LEN[simulation_board.player_2])
-                player_1_score += tmp
-                player_2_score += 1-tmp
+            if batch:
+                player_1, player_2 = batch_rollout(states[node], batch)
+                played_1 = played_2 = 0
+                visits_count = batch
+                free_1 = free_count[player_1]
+                free_2 = free_count[player_2]
+                won_1 = has_won[player_1]
+                won_2 = has_won[player_2]
+                player_1_wins = int((won_1 | ~won_2 & (free_1 < free_2)).sum())
+                player_2_wins = int((won_2 | ~won_1 & (free_1 > free_2)).sum())
             else:
-                tmp = int(HAS_WON[simulation_board.player_1] \
-                        or VALID_ACTIONS_LEN[simulation_board.player_1] < VALID_ACTIONS_LEN[simulation_board.player_2] \
-                    if not simulation_board.is_player_1 \
-                    else HAS_WON[simulation_board.player_2] \
-                        or VALID_ACTIONS_LEN[simulation_board.player_1] > VALID_ACTIONS_LEN[simulation_board.player_2])
-                player_1_score += tmp
-                player_2_score += 1-tmp
+                player_1, player_2, _, played_1, played_2 = rollout(states[node])
+                visits_count = 1
+
+                # a line wins the game, else the most boards won, a draw scores
+                # for neither player
+                player_1_wins = int(HAS_WON[player_1] or not HAS_WON[player_2]
+                                    and VALID_ACTIONS_LEN[player_1] < VALID_ACTIONS_LEN[player_2])
+                player_2_wins = int(HAS_WON[player_2] or not HAS_WON[player_1]
+                                    and VALID_ACTIONS_LEN[player_1] > VALID_ACTIONS_LEN[player_2])
 
             #backpropagate
-            while node.parent:
-                node.visited_count += visits
-                node.score += player_1_score if not node.is_player_1 else player_2_score
-                node = node.parent
+            while node != root:
+                visits[node] += visits_count
+                # every node scores the wins of the player who made its move
+                scores[node] += player_1_wins if states[node][3] else player_2_wins
+                if jumps and node == shared[jumps[-1]]:
+                    # back along the path the selection took
+                    child = jumps.pop()
+                else:
+                    child = node
+                node = parents[child]
+                if solved:
+                    solved = pool.prove(node)
+                if rave:
+                    # the moves below node were played in this game as well
+                    if states[node][3]:
+                        played_2 |= CELL_BITS[moves[child]]
+                        played = played_2
+                        score = player_2_wins
+                    else:
+                        played_1 |= CELL_BITS[moves[child]]
+                        played = played_1
+                        score = player_1_wins
+                    first = first_child[node]
+                    for sibling in range(first, first + expanded[node]):
+                        if played & CELL_BITS[moves[sibling]]:
+                            amaf_visits[sibling] += visits_count
+                            amaf_scores[sibling] += score
 
 
             count += 1
+        if stats:
+            stats.log()
         print(str(count), file=sys.stderr, flush = True)
+        return count
+
+    def root_statistics(self) -> tuple[list[int], list[int], list[int]]:
+        """Moves, visits and scores of the visited children of the root."""
+        pool = self.pool
+        first = pool.first_child[self.root]
+        if first < 0:
+            return [], [], []
+        children = [pool.shared[child] for child in range(first, first + pool.expanded[self.root])]
+        return list(pool.moves[first:first + len(children)]), \
+            [pool.visits[child] for child in children], [pool.scores[child] for child in children]
+
+    def merge_root_statistics(self, moves: list[int], visits: list[int],
+                              scores: list[int]) -> None:
+        """Add the root child statistics of another search of the same root.
+        Every searched node starts with one visit, which is only counted once.
+
+        """
+        pool = self.pool
+        root = self.root
+        if pool.first_child[root] < 0 and not pool.expand(root):
+            return
+        first = pool.first_child[root]
+        children = {pool.moves[child]: child
+                    for child in range(first, first + pool.child_count[root])}
+        for move, child_visits, child_score in zip(moves, visits, scores):
+            child = children[move]
+            if child >= first + pool.expanded[root]:
+                # visit swaps the child with the first unvisited one
+                swapped = child
+                child = pool.visit(root, child)
+                children[pool.moves[swapped]] = swapped
+                children[move] = child
+            pool.visits[pool.shared[child]] += child_visits - 1
+            pool.scores[pool.shared[child]] += child_score
+
+    def run_parallel(self, run_time: float, workers: int, executor=None) -> int:
+        """Root parallel search for offline analysis: workers - 1 processes search
+        the root next to this one, with the same rollouts, transposition table,
+        RAVE and endgame solver, then their root child statistics are merged
+        into this tree, so best_child picks from the aggregate.
+        `executor` may be a reused concurrent.futures.ProcessPoolExecutor.
+        Returns the number of iterations of all searches together.
+
+        """
+        # process pools are for analysis only, Codingame runs a single process
+        from concurrent.futures import ProcessPoolExecutor
+        end = time.perf_counter() + run_time
+        own_executor = executor is None and workers > 1
+        if own_executor:
+            executor = ProcessPoolExecutor(workers - 1)
+        try:
+            # a seeded search seeds its workers apart, and the same way every time
+            rng_seed = RNG_SEED
+            pool = self.pool
+            transpositions = 0 if pool.table is None else pool.table.capacity
+            futures = [
+                executor.submit(search_root, self.state, end, self.batch, self.heavy,
+                                pool.capacity, transpositions, pool.amaf_visits is not None,
+                                self.endgame, None if rng_seed is None else rng_seed + worker)
+                for worker in range(1, workers)
+            ]
+            self.expand_root()
+            count = self.run(max(0.0, end - time.perf_counter()))
+            for future in futures:
+                moves, visits, scores, worker_count = future.result()
+                self.merge_root_statistics(moves, visits, scores)
+                count += worker_count
+        finally:
+            if own_executor:
+                executor.shutdown()
+        print(f"parallel {count}", file=sys.stderr, flush = True)
+        return count
+
+def search_root(state: tuple, end: float, batch: int, heavy: bool, capacity: int,
+                transpositions: int = 0, rave: bool = False, endgame: int = 0,
+                rng_seed: int = None) -> tuple:
+    """Worker of UltimateBoard.run_parallel: search state until perf_counter() reaches end,
+    in a pool and with a search configured as the parent's, the random numbers
+    seeded by rng_seed.
+    Returns the root child statistics and the number of iterations.
+
+    """
+    # forked workers share the random state of the parent: reseed, from the os
+    # without a seed
+    seed_rng(rng_seed)
+    board = UltimateBoard.from_state(state, NodePool(capacity, transpositions, rave), batch,
+                                     heavy, endgame)
+    board.expand_root()
+    count = board.run(max(0.0, end - time.perf_counter()))
+    return (*board.root_statistics(), count)
+
+class SearchSession():
+    """Context for the search of one turn. Entering it turns the cyclic garbage
+    collector off, so it cannot fire in the middle of run(), and it stays off:
+    the garbage is collected explicitly by collect() once the move is out
+    (if the opponent has not answered yet), which also logs the allocations
+    and collector pauses of the turn to stderr.
+
+    """
+    def __init__(self) -> None:
+        self.allocated_blocks = 0
+        self.pauses = []
+        self.search_pauses = 0
+        self._blocks = 0
+        self._pause_begin = 0
+        gc.callbacks.append(self._on_gc)
+
+    def _on_gc(self, phase: str, _info: dict) -> None:
+        """Time every collection, wherever it comes from."""
+        if phase == "start":
+            self._pause_begin = time.perf_counter()
+        else:
+            self.pauses.append(time.perf_counter() - self._pause_begin)
+
+    def __enter__(self) -> SearchSession:
+        gc.disable()
+        self.pauses.clear()
+        self._blocks = sys.getallocatedblocks()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.allocated_blocks = sys.getallocatedblocks() - self._blocks
+        self.search_pauses = len(self.pauses)
+
+    def collect(self) -> None:
+        """Collect the garbage of the turn and log it. Call outside our clock."""
+        collected = gc.collect()
+        print(
+            f"gc allocated {self.allocated_blocks} blocks, "
+            f"{self.search_pauses} pauses in search "
+            f"({sum(self.pauses[:self.search_pauses]) * 1000:.2f} ms), "
+            f"collected {collected} in {sum(self.pauses[self.search_pauses:]) * 1000:.2f} ms",
+            file=sys.stderr, flush = True
+        )
+
+def use_opponent_time(root: UltimateBoard, session: SearchSession) -> None:
+    """Compact the tree, collect the garbage and ponder once our move is out.
+    An opponent that already answered has started our clock: compaction waits
+    then, the re-rooting of the next turn compacts a pool half full, and so
+    does the garbage, for the next collection. Pondering only starts before
+    the opponent's move arrives.
+
+    """
+    if not input_waiting():
+        retained = root.compact()
+        print(f"retained {retained}", file=sys.stderr, flush = True)
+    if not input_waiting():
+        session.collect()
+    if PONDER and not input_waiting():
+        root.ponder()
 
 def main():
     """Main"""
+    # the lookup tables live for the whole game, keep them out of every collection
+    gc.freeze()
+    session = SearchSession()
+    clock = TimeManager()
+
     #first turn
+    # our clock starts when the opponent's move arrives, with the process if
+    # it was already waiting for us
+    waiting = input_waiting()
     opponent = input()
+    clock.start(FIRST_TURN_TIME, FIRST_TURN_MARGIN, PROCESS_BEGIN_NS if waiting else None)
     valid_action_count = int(input())
     for _ in range(valid_action_count):
         _, _ = [int(j) for j in input().split()]
 
-    root = None
-
-    if opponent[0] == '-':
-        root = UltimateBoard(True, (4, 0b000010000), None)
-        root.run(.99)
-        print("4 4")
-    else:
-        root = UltimateBoard(False, STRING_TO_ACTION[opponent], None)
-        root.run(.99)
-        root = root.best_child
-        root.parent = None
-        print(ACTION_TO_STRING[root.move])
+    # the first player plays on board_1, as with the referee
+    state = (0, 0, None, False)
+    if opponent[0] != '-':
+        state = next_state(state, STRING_TO_CELL[opponent])
+    root = UltimateBoard.from_state(state, NodePool(POOL_CAPACITY, TRANSPOSITIONS, RAVE),
+                                    heavy=HEAVY_PLAYOUTS, endgame=ENDGAME_CELLS)
+    with session:
+        move = root.choose_move(clock.search_time())
+    print(CELL_TO_STRING[move], flush=True)
+    # the opponent's clock is running now
+    clock.stop()
+    use_opponent_time(root, session)
 
 
     #game loop
     while True:
+        # a move that is already waiting arrived while we compacted, collected
+        # or pondered, after our answer and the last look at stdin: its clock
+        # started then
+        waiting = input_waiting()
         opponent = input()
+        clock.start(TURN_TIME, TURN_MARGIN,
+                    max(clock.answered, INPUT_IDLE_NS) if waiting else None)
         valid_action_count = int(input())
         for _ in range(valid_action_count):
             _, _ = [int(j) for j in input().split()]
 
-        if not root.children and not root.unvisited_actions:
-            root.unvisited_actions.extend(root.get_valid_actions())
-
-        # if not root.children and not root.unvisited_actions:
-        #     if HAS_WON[root._player_1]:
+        # if not root.get_valid_actions():
+        #     if HAS_WON[root.state[0] >> 81]:
         #         print("player 1 has won")
-        #     elif HAS_WON[root._player_2]:
+        #     elif HAS_WON[root.state[1] >> 81]:
         #         print("player 2 has won")
         #     else:
         #         print("draw")
         #     return
 
-        root = root.children[STRING_TO_ACTION[opponent]]
-        root.run(.095)
-        root = root.best_child
-        root.parent = None
-        print(ACTION_TO_STRING[root.move])
+        # compacting now would eat into our clock, it waits for our move
+        with session:
+            root.advance_root(STRING_TO_CELL[opponent], compact=False)
+            print(f"kept {root.pool.visits[root.pool.shared[root.root]]} visits",
+                  file=sys.stderr, flush = True)
+            move = root.choose_move(clock.search_time())
+        print(CELL_TO_STRING[move], flush=True)
+        # the opponent's clock is running now
+        clock.stop()
+        use_opponent_time(root, session)
 
-main()
+if __name__ == "__main__":
+    # python bot_gold.py --seed N: the same rollouts in every game, as far as the clock allows
+    if "--seed" in sys.argv:
+        seed_rng(int(sys.argv[sys.argv.index("--seed") + 1]))
+    main()
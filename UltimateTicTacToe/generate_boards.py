@@ -1,6 +1,13 @@
+"""Offline table generation for the Ultimate TicTacToe bots.
+
+Running this file regenerates the lookup tables embedded in the bots
+between the BEGIN/END GENERATED TABLES markers, so they do not need to
+be rebuilt from scratch at import (Codingame wants a single file).
+"""
 from itertools import product
 from collections import namedtuple
-
+import os
+import sys
 
 
 Action = namedtuple('Action', ['x_coord', 'y_coord'])
@@ -43,5 +50,78 @@ NORMAL_BOARDS = {
     grid: Board(winner := get_winner(grid), get_actions(grid) if winner == 0 else []) for grid in product(product([0, 1, 2], repeat = 3), repeat = 3)
 }
 
-print(NORMAL_BOARDS)
 
+BOT_FILES = ["bot.py", "new_bot.py", "bot_gold.py"]
+BEGIN_MARKER = "# BEGIN GENERATED TABLES (python generate_boards.py)\n"
+END_MARKER = "# END GENERATED TABLES\n"
+LINE_WIDTH = 64
+
+WINS = [
+    0b111000000,
+    0b000111000,
+    0b000000111,
+
+    0b100100100,
+    0b010010010,
+    0b001001001,
+
+    0b100010001,
+    0b001010100,
+]
+# Same order as MOVES in the bots: lowest bit first, bit 1 << (8 - small).
+MOVES = [1 << bit for bit in range(9)]
+
+def has_won_bits():
+    """Returns an int with bit `state` set when the 9-bit `state` has a line."""
+    bits = 0
+    for state in range(0b1000000000):
+        if any((win & state) == win for win in WINS):
+            bits |= 1 << state
+    return bits
+
+def valid_moves(board):
+    """Returns the small indexes of the free cells of `board` in MOVES order."""
+    return [8 - bit for bit, move in enumerate(MOVES) if not move & board]
+
+def split(text, indent="    "):
+    """Split a long literal over several lines of implicitly joined strings."""
+    return "\n".join(
+        f'{indent}"{text[index:index + LINE_WIDTH]}"'
+        for index in range(0, len(text), LINE_WIDTH)
+    )
+
+def render_tables():
+    """Returns the generated table block as python source."""
+    lengths = "".join(str(len(valid_moves(board))) for board in range(0b1000000000))
+    moves = "".join(
+        str(small) for board in range(0b1000000000) for small in valid_moves(board)
+    )
+    return BEGIN_MARKER \
+        + f"HAS_WON_BITS = int(\n{split(f'{has_won_bits():0128x}')},\n    16\n)\n" \
+        + f"VALID_ACTIONS_LEN_DIGITS = (\n{split(lengths)}\n)\n" \
+        + f"VALID_MOVES_DIGITS = (\n{split(moves)}\n)\n" \
+        + END_MARKER
+
+def embed(path, tables, begin_marker=BEGIN_MARKER, end_marker=END_MARKER):
+    """Replace the generated block of the bot at `path`. Returns whether it changed."""
+    with open(path, encoding="utf-8") as file:
+        source = file.read()
+    begin = source.index(begin_marker)
+    end = source.index(end_marker, begin) + len(end_marker)
+    updated = source[:begin] + tables + source[end:]
+    if updated == source:
+        return False
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(updated)
+    return True
+
+def main():
+    """Regenerate the tables in every bot."""
+    tables = render_tables()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in BOT_FILES:
+        changed = embed(os.path.join(directory, name), tables)
+        print(f"{name}: {'updated' if changed else 'up to date'}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Offline opening book generation for the gold bot.
+
+Running this file searches every position of the first plies of the game in
+which the bot may have to move, for a long time each, and embeds the moves
+found in bot_gold.py between the BEGIN/END GENERATED BOOK markers. The bot
+plays a book move at once instead of searching for it. Symmetric positions
+share their entry, by the key and the moves of their canonical_state.
+Usage: python generate_book.py [--plies N] [--seconds S] [--jobs N]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr
+import io
+from itertools import repeat
+import os
+import sys
+
+try:
+    from . import bot_gold
+    from .generate_boards import embed, split
+except ImportError: # run as a script
+    import bot_gold
+    from generate_boards import embed, split
+
+BOOK_PLIES = 3
+SEARCH_SECONDS = 120
+SEARCH_CAPACITY = 1 << 21
+BEGIN_MARKER = "# BEGIN GENERATED BOOK (python generate_book.py)\n"
+END_MARKER = "# END GENERATED BOOK\n"
+
+def search_position(state: tuple, seconds: float, capacity: int) -> int:
+    """Best move of state after searching it for seconds. The search is seeded
+    with the key of the position, so a book can be generated again.
+
+    """
+    bot_gold.seed_rng(bot_gold.zobrist_key(state))
+    board = bot_gold.UltimateBoard.from_state(state, bot_gold.NodePool(capacity),
+                                              endgame=bot_gold.ENDGAME_CELLS)
+    board.expand_root()
+    with redirect_stderr(io.StringIO()):
+        board.run(seconds)
+    return board.pool.moves[board.best_child]
+
+def replies(states: list[tuple], book: dict[int, int]) -> list[tuple]:
+    """The positions after the book move of each of the canonical states and
+    every reply to it, up to symmetry.
+
+    """
+    positions = []
+    for state in states:
+        state = bot_gold.next_state(state, book[bot_gold.zobrist_key(state)])
+        if not bot_gold.IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81]:
+            positions.extend(bot_gold.next_state(state, move)
+                             for move in bot_gold.unique_moves(state))
+    return positions
+
+def generate(plies: int = BOOK_PLIES, seconds: float = SEARCH_SECONDS, jobs: int = 1,
+             capacity: int = SEARCH_CAPACITY) -> dict[int, int]:
+    """Search the positions of the first plies, ply by ply. Those of a ply
+    follow a book move two plies earlier and any reply of the opponent: as the
+    first player the bot starts from the empty board, as the second player
+    from any first move. Returns the book, by Zobrist key of the canonical
+    positions.
+
+    """
+    start = (0, 0, None, False)
+    levels = [[start], [bot_gold.next_state(start, move)
+                        for move in bot_gold.unique_moves(start)]]
+    book = {}
+    with ProcessPoolExecutor(jobs) as executor:
+        for ply in range(plies):
+            if ply >= len(levels):
+                levels.append(replies(levels[ply - 2], book))
+            canonical = (bot_gold.canonical_state(state)[0] for state in levels[ply])
+            levels[ply] = list({bot_gold.zobrist_key(state): state
+                                for state in canonical}.values())
+            positions = levels[ply]
+            print(f"ply {ply}: {len(positions)} positions", file=sys.stderr, flush=True)
+            moves = executor.map(search_position, positions, repeat(seconds), repeat(capacity))
+            for state, move in zip(positions, moves):
+                book[bot_gold.zobrist_key(state)] = move
+    return book
+
+def render_book(book: dict[int, int], plies: int, seconds: float) -> str:
+    """Returns the generated book block as python source."""
+    digits = "".join(f"{key:016x}{move:02x}" for key, move in sorted(book.items()))
+    literal = f"(\n{split(digits)}\n)" if digits else '""'
+    return BEGIN_MARKER \
+        + f"# {len(book)} positions of {plies} plies, searched {seconds:g} s each\n" \
+        + f"BOOK_DIGITS = {literal}\n" \
+        + END_MARKER
+
+def main():
+    """Generate the book and embed it in the gold bot."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plies", type=int, default=BOOK_PLIES)
+    parser.add_argument("--seconds", type=float, default=SEARCH_SECONDS)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--capacity", type=int, default=SEARCH_CAPACITY)
+    args = parser.parse_args()
+    book = generate(args.plies, args.seconds, args.jobs, args.capacity)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot_gold.py")
+    changed = embed(path, render_book(book, args.plies, args.seconds), BEGIN_MARKER, END_MARKER)
+    print(f"bot_gold.py: {'updated' if changed else 'up to date'}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 """My implementation for Codingame Ultimate TicTacToe."""
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from array import array
 import datetime
 from functools import lru_cache
+from itertools import accumulate
 from math import log, sqrt
 from random import choice, shuffle
 import sys
@@ -247,45 +249,93 @@ STRING_TO_ACTION = {
     "8 7": (8, 0b000000010),
     "8 8": (8, 0b000000001),
 }
-@lru_cache
-def won(board):
-    """Returns lambda to determine win."""
-    return lambda move: not move & board
-VALID_ACTIONS = {
-    board: list(filter(won(board), MOVES))
+# BEGIN GENERATED TABLES (python generate_boards.py)
+HAS_WON_BITS = int(
+    "fffffffffffffffffffef0f0eeee8080fffafaf0fafaaa80fffaf0f0aaaa8080"
+    "fffcaa80fefcaa80ffcc8080cccc8080fff0aa80faf0aa80ff80808080808080",
+    16
+)
+VALID_ACTIONS_LEN_DIGITS = (
+    "9887877687767665877676657665655487767665766565547665655465545443"
+    "8776766576656554766565546554544376656554655454436554544354434332"
+    "8776766576656554766565546554544376656554655454436554544354434332"
+    "7665655465545443655454435443433265545443544343325443433243323221"
+    "8776766576656554766565546554544376656554655454436554544354434332"
+    "7665655465545443655454435443433265545443544343325443433243323221"
+    "7665655465545443655454435443433265545443544343325443433243323221"
+    "6554544354434332544343324332322154434332433232214332322132212110"
+)
+VALID_MOVES_DIGITS = (
+    "8765432107654321086543210654321087543210754321085432105432108764"
+    "3210764321086432106432108743210743210843210432108765321076532108"
+    "6532106532108753210753210853210532108763210763210863210632108732"
+    "1073210832103210876542107654210865421065421087542107542108542105"
+    "4210876421076421086421064210874210742108421042108765210765210865"
+    "2106521087521075210852105210876210762108621062108721072108210210"
+    "8765431076543108654310654310875431075431085431054310876431076431"
+    "0864310643108743107431084310431087653107653108653106531087531075"
+    "3108531053108763107631086310631087310731083103108765410765410865"
+    "4106541087541075410854105410876410764108641064108741074108410410"
+    "8765107651086510651087510751085105108761076108610610871071081010"
+    "8765432076543208654320654320875432075432085432054320876432076432"
+    "0864320643208743207432084320432087653207653208653206532087532075"
+    "3208532053208763207632086320632087320732083203208765420765420865"
+    "4206542087542075420854205420876420764208642064208742074208420420"
+    "8765207652086520652087520752085205208762076208620620872072082020"
+    "8765430765430865430654308754307543085430543087643076430864306430"
+    "8743074308430430876530765308653065308753075308530530876307630863"
+    "0630873073083030876540765408654065408754075408540540876407640864"
+    "0640874074084040876507650865065087507508505087607608606087070800"
+    "8765432176543218654321654321875432175432185432154321876432176432"
+    "1864321643218743217432184321432187653217653218653216532187532175"
+    "3218532153218763217632186321632187321732183213218765421765421865"
+    "4216542187542175421854215421876421764218642164218742174218421421"
+    "8765217652186521652187521752185215218762176218621621872172182121"
+    "8765431765431865431654318754317543185431543187643176431864316431"
+    "8743174318431431876531765318653165318753175318531531876317631863"
+    "1631873173183131876541765418654165418754175418541541876417641864"
+    "1641874174184141876517651865165187517518515187617618616187171811"
+    "8765432765432865432654328754327543285432543287643276432864326432"
+    "8743274328432432876532765328653265328753275328532532876327632863"
+    "2632873273283232876542765428654265428754275428542542876427642864"
+    "2642874274284242876527652865265287527528525287627628626287272822"
+    "8765437654386543654387543754385435438764376438643643874374384343"
+    "8765376538653653875375385353876376386363873738338765476548654654"
+    "8754754854548764764864648747484487657658656587575855876768668778"
+)
+# END GENERATED TABLES
+HAS_WON = bytes(HAS_WON_BITS >> state & 1 for state in range(0b1000000000))
+VALID_ACTIONS_LEN = bytes(map(int, VALID_ACTIONS_LEN_DIGITS))
+VALID_ACTIONS_OFFSET = array('H', accumulate(VALID_ACTIONS_LEN, initial=0))
+VALID_MOVES = bytes(map(int, VALID_MOVES_DIGITS))
+VALID_ACTIONS = [
+    [BIG_TO_SMALL[small] for small in
+        VALID_MOVES[VALID_ACTIONS_OFFSET[board]:VALID_ACTIONS_OFFSET[board + 1]]]
     for board in range(0b000000000, 0b1000000000)
-}
-VALID_ACTIONS_LEN = {
-    board: len(actions)
-    for board, actions in VALID_ACTIONS.items()
-}
-def to_big(index):
-    """Returns lambda to translate small to big move."""
-    return lambda action: (index, action)
-
-TRANSLATED_VALID_ACTIONS = {
-    index: {
-        board: list(map(to_big(index), VALID_ACTIONS[board]))
+]
+ACTIONS = [[(index, BIG_TO_SMALL[small]) for small in range(9)] for index in range(9)]
+TRANSLATED_VALID_ACTIONS = [
+    [
+        [actions[small] for small in
+            VALID_MOVES[VALID_ACTIONS_OFFSET[board]:VALID_ACTIONS_OFFSET[board + 1]]]
         for board in range(0b000000000, 0b1000000000)
-    } for index in range(9)
-}
+    ] for actions in ACTIONS
+]
 
-def win(state):
-    """Returns whether state is a win."""
-    return lambda win: ((win & state) == win)
-HAS_WON = {
-    state: any(map(win(state), WINS))
-    for state in range(0b000000000, 0b1000000000)
-}
-IS_TERMINAL = {
-    player_1: {
-        player_2: HAS_WON[player_1] \
-            or HAS_WON[player_2] \
-            or (player_1 | player_2) == 0b111111111
-        for player_2 in range(0b000000000, 0b1000000000)
-    }
-    for player_1 in range(0b000000000, 0b1000000000)
-}
+def terminal_row(player_1):
+    """Returns the IS_TERMINAL row of player_1 against every player_2."""
+    if HAS_WON[player_1]:
+        return b"\x01" * 0b1000000000
+    row = bytearray(HAS_WON)
+    subset = player_1
+    while True:
+        # full board: player_2 holds every cell player_1 does not
+        row[(0b111111111 ^ player_1) | subset] = 1
+        if not subset:
+            return bytes(row)
+        subset = (subset - 1) & player_1
+# Indexed by player_1 << 9 | player_2
+IS_TERMINAL = b"".join(map(terminal_row, range(0b000000000, 0b1000000000)))
 
 C = .6
 @lru_cache
@@ -304,7 +354,7 @@ def get_valid_actions(move, grid_player_1, grid_player_2, player_1, player_2) ->
 
     if move is not None:
         index = SMALL_TO_BIG[move[1]]
-        if not IS_TERMINAL[grid_player_1[index]][grid_player_2[index]]:
+        if not IS_TERMINAL[grid_player_1[index] << 9 | grid_player_2[index]]:
             valid_actions.extend(TRANSLATED_VALID_ACTIONS[index]\
                 [grid_player_1[index] | grid_player_2[index]])
 
@@ -374,7 +424,7 @@ class UltimateBoard():
 
         if self.move is not None:
             index = SMALL_TO_BIG[self.move[1]]
-            if not IS_TERMINAL[self.grid_player_1[index]][self.grid_player_2[index]]:
+            if not IS_TERMINAL[self.grid_player_1[index] << 9 | self.grid_player_2[index]]:
                 valid_actions.extend(TRANSLATED_VALID_ACTIONS[index]\
                         [self.grid_player_1[index] | self.grid_player_2[index]][:])
 
@@ -435,7 +485,7 @@ class UltimateBoard():
                     loc_player_2 |= BIG_TO_SMALL[big_move]
 
 
-            while not IS_TERMINAL[loc_player_1][loc_player_2]:
+            while not IS_TERMINAL[loc_player_1 << 9 | loc_player_2]:
                 depth += 1
                 actions = get_valid_actions(
                     last_move,
@@ -491,10 +541,10 @@ class UltimateBoard():
 def main():
     """Main"""
     #first turn
-    opponent = '-'#input()
-    # valid_action_count = int(input())
-    # for _ in range(valid_action_count):
-    #     _, _ = [int(j) for j in input().split()]
+    opponent = input()
+    valid_action_count = int(input())
+    for _ in range(valid_action_count):
+        _, _ = [int(j) for j in input().split()]
 
     root = None
 
@@ -512,10 +562,10 @@ def main():
 
     #game loop
     while True:
-        # opponent = input()
-        # valid_action_count = int(input())
-        # for _ in range(valid_action_count):
-        #     _, _ = [int(j) for j in input().split()]
+        opponent = input()
+        valid_action_count = int(input())
+        for _ in range(valid_action_count):
+            _, _ = [int(j) for j in input().split()]
 
         if not root.children and not root.unvisited_actions:
             root.unvisited_actions.extend(root.get_valid_actions())
@@ -529,10 +579,16 @@ def main():
                 print("draw")
             return
 
-        # root = root.children[STRING_TO_ACTION[opponent]]
+        action = STRING_TO_ACTION[opponent]
+        if action not in root.children:
+            # a move the search did not get to
+            root.children[action] = UltimateBoard(not root.is_player_1, action, root)
+        root = root.children[action]
+        root.parent = None
         root.run(.095)
         root = root.best_child
         root.parent = None
         print(ACTION_TO_STRING[root.move])
 
-# main()
+if __name__ == "__main__":
+    main()
@@ -1,3 +0,0 @@
-import pstats
-
-pstats.Stats("stats").print_stats()
\ No newline at end of file
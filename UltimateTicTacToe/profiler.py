@@ -1,6 +1,326 @@
-"""Profiler"""
+"""Profile a bot through one reproducible game, phase by phase.
+
+Usage: python profiler.py run <bot> [--seed N] [--moves "r c,r c"] [--second]
+                              [--turns N] [--sample MS] [--output DIR]
+       python profiler.py compare <old DIR> <new DIR>
+The bot module of this directory plays in this process, its stdin and stdout
+attached to a referee that answers each move at once: with the scripted moves
+first, then seeded random ones. cProfile, and with --sample a stack sampler,
+cover each phase on its own: the import (table build), the first turn and the
+turns after it. Every phase gets a text report sorted by own time, without
+paths or timestamps so that two runs diff cleanly, and the bot's stderr log
+is saved next to them. The reports of the run before move to <DIR>_prev, and
+compare prints what changed between two runs.
+"""
+import argparse
+from collections import Counter
 import cProfile
-import new_bot as bot
+from contextlib import redirect_stderr, redirect_stdout
+import importlib.util
+import io
+import os
+import pstats
+import random
+import shutil
+import sys
+import threading
+
+try:
+    from . import bot_gold
+except ImportError: # run as a script
+    import bot_gold
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+OUTPUT = os.path.join(DIRECTORY, "stats")
+PHASES = ("tables", "first_turn", "turns")
+TURNS = 20
+COMPARE_FUNCTIONS = 15
+
+class Sampler(threading.Thread):
+    """Counts the stacks of a thread every interval seconds, by phase."""
+    def __init__(self, interval: float, thread_id: int) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.thread_id = thread_id
+        self.phase = None
+        self.samples = {phase: Counter() for phase in PHASES}
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            phase = self.phase
+            frame = sys._current_frames().get(self.thread_id)
+            if phase is None or frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            self.samples[phase][";".join(reversed(stack))] += 1
+
+class Referee():
+    """stdin and stdout of the profiled bot, which switch the profiled phase:
+    reading the opponent's move starts a turn. A move written is played and
+    answered at once, and the answer waits for the next reads. Meanwhile the
+    read end of a pipe holds a byte, so a bot polling its stdin sees it.
+
+    """
+    def __init__(self, moves: list[int], seed: int, turns: int, second: bool,
+                 sampler: Sampler = None) -> None:
+        self.script = moves
+        self.rng = random.Random(seed)
+        self.turns = turns
+        self.sampler = sampler
+        self.profiles = {phase: cProfile.Profile() for phase in PHASES}
+        self.phase = None
+        self.state = (0, 0, None, False)
+        self.moves = []
+        self.lines = []
+        self.output = ""
+        self.turn = 0
+        self._turn_pending = False
+        self._ready, self._signal = os.pipe()
+        self._signalled = False
+        if second:
+            self.answer()
+        else:
+            self.queue("-1 -1")
+
+    def queue(self, opponent: str) -> None:
+        """Queue the input of a turn after the opponent's move."""
+        actions = sorted(bot_gold.CELL_TO_STRING[move]
+                         for move in bot_gold.get_valid_moves(self.state))
+        self.lines = [opponent, str(len(actions)), *actions]
+        self._turn_pending = True
+
+    def answer(self) -> None:
+        """Play the opponent's move and queue it, unless the game is over."""
+        if not self.finished() and self.turn < self.turns:
+            if self.script:
+                reply = self.script.pop(0)
+            else:
+                reply = self.rng.choice(bot_gold.get_valid_moves(self.state))
+            self.play(reply)
+            if not self.finished():
+                self.queue(bot_gold.CELL_TO_STRING[reply])
+        # the end of the input is readable too
+        if not self._signalled:
+            os.write(self._signal, b"\n")
+            self._signalled = True
+
+    def enter(self, phase: str) -> None:
+        """Profile phase from now on, nothing for None."""
+        self.phase = phase
+        if self.sampler:
+            self.sampler.phase = phase
+        if phase is not None:
+            self.profiles[phase].enable()
+
+    def leave(self) -> str:
+        """Stop profiling, for the referee's own work. Returns the phase left."""
+        phase = self.phase
+        if phase is not None:
+            self.profiles[phase].disable()
+        self.enter(None)
+        return phase
+
+    def finished(self) -> bool:
+        """Whether the game is over."""
+        macro_1, macro_2 = self.state[0] >> 81, self.state[1] >> 81
+        return bool(bot_gold.IS_TERMINAL[macro_1 << 9 | macro_2]) \
+            or not bot_gold.get_valid_moves(self.state)
+
+    def play(self, move: int) -> None:
+        """Play move, for either side."""
+        if move not in bot_gold.get_valid_moves(self.state):
+            raise ValueError(f"invalid move {bot_gold.CELL_TO_STRING.get(move, move)}")
+        self.state = bot_gold.next_state(self.state, move)
+        self.moves.append(move)
+
+    def fileno(self) -> int:
+        """The pipe that is readable while a turn waits for the bot."""
+        return self._ready
+
+    def readline(self) -> str:
+        """Next input line of the bot, an empty one (EOF) once the game is over."""
+        phase = self.leave()
+        if not self.lines:
+            return ""
+        if self._turn_pending:
+            self._turn_pending = False
+            self.turn += 1
+            phase = "first_turn" if self.turn == 1 else "turns"
+        line = self.lines.pop(0)
+        if not self.lines and self._signalled:
+            os.read(self._ready, 1)
+            self._signalled = False
+        self.enter(phase)
+        return line + "\n"
+
+    def write(self, text: str) -> int:
+        """Output of the bot: every complete line is its move."""
+        phase = self.leave()
+        self.output += text
+        while "\n" in self.output:
+            line, _, self.output = self.output.partition("\n")
+            self.play(bot_gold.STRING_TO_CELL[line.strip()])
+            self.answer()
+        self.enter(phase)
+        return len(text)
+
+    def flush(self) -> None:
+        """Nothing is buffered."""
+
+    def close(self) -> None:
+        """Close the pipe."""
+        os.close(self._ready)
+        os.close(self._signal)
+
+def profile_game(bot: str, moves: list[int], seed: int, turns: int, second: bool,
+                 sample_ms: float) -> tuple[Referee, Sampler, str]:
+    """Import the bot module fresh and play one game with it.
+    Returns the referee with the profiles, the sampler and the bot's stderr log.
+
+    """
+    sampler = Sampler(sample_ms / 1000, threading.get_ident()) if sample_ms else None
+    referee = Referee(moves, seed, turns, second, sampler)
+    # the same rollouts for the same bot and seed, as far as the clock allows
+    random.seed(seed)
+    log = io.StringIO()
+    stdin = sys.stdin
+    if sampler:
+        sampler.start()
+    try:
+        sys.stdin = referee
+        with redirect_stdout(referee), redirect_stderr(log):
+            # a fresh module, whose import builds the tables again
+            spec = importlib.util.spec_from_file_location(
+                f"profiled_{bot}", os.path.join(DIRECTORY, f"{bot}.py"))
+            module = importlib.util.module_from_spec(spec)
+            referee.enter("tables")
+            spec.loader.exec_module(module)
+            referee.leave()
+            # a bot with its own generator seeds it, the others share the module's
+            if hasattr(module, "seed_rng"):
+                module.seed_rng(seed)
+            try:
+                module.main()
+            except EOFError: # the game is over
+                pass
+            finally:
+                referee.leave()
+    finally:
+        sys.stdin = stdin
+        referee.close()
+        if sampler:
+            sampler.stopped.set()
+            sampler.join()
+    return referee, sampler, log.getvalue()
+
+def function_name(key: tuple) -> str:
+    """pstats function key as file:line(name), without the path."""
+    filename, line, name = key
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+def profile_report(profile: cProfile.Profile, phase: str) -> str:
+    """Every function of the profile by own time: calls, own and cumulative seconds."""
+    stats = pstats.Stats(profile).stats if profile.getstats() else {}
+    rows = sorted(((function_name(key), calls, own, cumulative)
+                   for key, (_, calls, own, cumulative, _) in stats.items()),
+                  key=lambda row: (-row[2], row[0]))
+    total = sum(row[2] for row in rows)
+    lines = [f"# {phase}: {sum(row[1] for row in rows)} calls, {total:.3f} s",
+             f"{'calls':>10}{'own s':>10}{'cum s':>10}  function"]
+    lines += [f"{calls:>10}{own:>10.4f}{cumulative:>10.4f}  {name}"
+              for name, calls, own, cumulative in rows]
+    return "\n".join(lines) + "\n"
+
+def sample_report(samples: Counter) -> str:
+    """Collapsed stacks with their sample counts, most sampled first."""
+    return "".join(f"{stack} {count}\n" for stack, count
+                   in sorted(samples.items(), key=lambda item: (-item[1], item[0])))
+
+def save_reports(output: str, referee: Referee, sampler: Sampler, log: str) -> None:
+    """Write the reports of a run to output, the one before moved to output_prev."""
+    if os.path.isdir(output):
+        previous = output.rstrip(os.sep) + "_prev"
+        shutil.rmtree(previous, ignore_errors=True)
+        os.replace(output, previous)
+    os.makedirs(output)
+    for phase in PHASES:
+        with open(os.path.join(output, f"{phase}.txt"), "w", encoding="utf-8") as file:
+            file.write(profile_report(referee.profiles[phase], phase))
+        if sampler:
+            with open(os.path.join(output, f"{phase}.samples.txt"), "w", encoding="utf-8") as file:
+                file.write(sample_report(sampler.samples[phase]))
+    with open(os.path.join(output, "game.txt"), "w", encoding="utf-8") as file:
+        file.write(" ".join(bot_gold.CELL_TO_STRING[move].replace(" ", ",")
+                            for move in referee.moves) + "\n")
+    with open(os.path.join(output, "log.txt"), "w", encoding="utf-8") as file:
+        file.write(log)
+
+def read_report(path: str) -> tuple[float, dict[str, tuple[int, float]]]:
+    """Total own time and the calls and own time per function of a phase report."""
+    functions = {}
+    with open(path, encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    for line in lines[2:]:
+        calls, own, _, name = line.split(maxsplit=3)
+        functions[name] = (int(calls), float(own))
+    return sum(own for _, own in functions.values()), functions
+
+def compare(old: str, new: str, count: int = COMPARE_FUNCTIONS) -> str:
+    """The change of every phase between two runs, and of the functions that
+    changed the most in own time.
+
+    """
+    lines = []
+    for phase in PHASES:
+        old_path, new_path = (os.path.join(run, f"{phase}.txt") for run in (old, new))
+        if not (os.path.exists(old_path) and os.path.exists(new_path)):
+            continue
+        old_total, old_functions = read_report(old_path)
+        new_total, new_functions = read_report(new_path)
+        lines.append(f"{phase}: {old_total:.3f} s -> {new_total:.3f} s "
+                     f"({new_total - old_total:+.3f} s)")
+        changes = sorted(
+            ((new_functions.get(name, (0, 0.0)), old_functions.get(name, (0, 0.0)), name)
+             for name in old_functions.keys() | new_functions.keys()),
+            key=lambda change: (-abs(change[0][1] - change[1][1]), change[2]))
+        for (new_calls, new_own), (old_calls, old_own), name in changes[:count]:
+            lines.append(f"  {new_own - old_own:+9.4f} s {old_own:9.4f} -> {new_own:<9.4f}"
+                         f"{old_calls:>9} -> {new_calls:<9} {name}")
+    return "\n".join(lines)
+
+def main():
+    """Profile the bot given on the command line, or compare two runs."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="profile one game of a bot")
+    run.add_argument("bot", help="module of this directory, as bot_gold")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--moves", default="", help='scripted opponent moves, as "4 4,3 3"')
+    run.add_argument("--second", action="store_true", help="the opponent moves first")
+    run.add_argument("--turns", type=int, default=TURNS, help="turns of the bot at most")
+    run.add_argument("--sample", type=float, default=0, help="sampling interval in ms")
+    run.add_argument("--output", default=OUTPUT)
+    diff = commands.add_parser("compare", help="compare the reports of two runs")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    args = parser.parse_args()
 
-cProfile.run("bot.main()", 'stats')
+    if args.command == "compare":
+        print(compare(args.old, args.new))
+        return
+    moves = [bot_gold.STRING_TO_CELL[move.strip()] for move in args.moves.split(",") if move]
+    referee, sampler, log = profile_game(args.bot, moves, args.seed, args.turns, args.second,
+                                         args.sample)
+    save_reports(args.output, referee, sampler, log)
+    print(f"{args.bot}: {referee.turn} turns, {len(referee.moves)} moves, "
+          f"reports in {args.output}")
+    previous = args.output.rstrip(os.sep) + "_prev"
+    if os.path.isdir(previous):
+        print(compare(previous, args.output))
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Tests for the local referee."""
+import sys
+
+from ..arena import game_winner, play_game, play_match, score_interval
+from ..bot_gold import next_state
+
+RANDOM_BOT = [sys.executable, "-c", """
+import random
+while True:
+    input()
+    actions = [input() for _ in range(int(input()))]
+    print(random.choice(actions), flush=True)
+"""]
+INVALID_BOT = [sys.executable, "-c", "input(); print('9 9', flush=True)"]
+SILENT_BOT = [sys.executable, "-c", "import time; time.sleep(5)"]
+
+def test_play_game():
+    """Games end by the rules, and a bot that does not answer properly loses."""
+    result = play_game([RANDOM_BOT, RANDOM_BOT])
+    assert result.reason == "end"
+    assert result.plies == len(result.latencies[0]) + len(result.latencies[1]) >= 17
+
+    assert play_game([INVALID_BOT, RANDOM_BOT])[:2] == (1, "invalid")
+    assert play_game([RANDOM_BOT, SILENT_BOT], turn_ms=50, first_turn_ms=200)[:2] \
+        == (0, "timeout")
+    assert play_game([RANDOM_BOT, [sys.executable, "-c", "pass"]])[:2] == (0, "crash")
+
+def test_game_winner():
+    """Without a line of boards the player with the most boards wins."""
+    state = (0, 0, None, False)
+    # player 1 takes the top left board with its top row
+    for move in (0, 9, 1, 10, 2):
+        state = next_state(state, move)
+    assert game_winner(state) == 0
+    assert game_winner((0, 0, None, False)) is None
+
+def test_play_match(tmp_path):
+    """Results are reported from the point of view of the first bot."""
+    random_bot = tmp_path / "random_bot.py"
+    random_bot.write_text(RANDOM_BOT[2])
+    invalid_bot = tmp_path / "invalid_bot.py"
+    invalid_bot.write_text(INVALID_BOT[2])
+    results = play_match(str(random_bot), str(invalid_bot), 2, 2)
+    assert [result.winner for result in results] == [0, 0]
+    assert [len(result.latencies[1]) for result in results] == [1, 1]
+    assert score_interval(results) == (1.0, 0.0)
@@ -0,0 +1,105 @@
+"""Benchmarks of the hot paths of the gold bot, with pytest-benchmark.
+
+They run once as plain tests. To time them against a stored baseline:
+    tox -e benchmark-baseline   # once per machine, saved in .benchmarks, again to renew
+    tox -e benchmark            # fails on a hot path 15% slower than the latest baseline
+Every benchmark works on the same seeded corpus of positions.
+"""
+import importlib.util
+from random import Random
+
+import pytest
+
+from .. import bot_gold
+from ..bot_gold import IS_TERMINAL, UltimateBoard, get_valid_moves, next_state, seed_rng, \
+    simulate
+
+CORPUS_SIZE = 200
+CORPUS_SEED = 0
+ROLLOUTS = 50
+ITERATIONS = 200
+RUN_TIME = .1
+
+def random_positions(count: int, corpus_seed: int) -> list[tuple]:
+    """Unfinished positions of seeded random games, 20 to 50 plies in."""
+    rng = Random(corpus_seed)
+    positions = []
+    while len(positions) < count:
+        state = (0, 0, None, False)
+        for _ in range(rng.randrange(20, 50)):
+            moves = get_valid_moves(state)
+            if not moves or IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81]:
+                break
+            state = next_state(state, rng.choice(moves))
+        else:
+            if get_valid_moves(state) \
+                    and not IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81]:
+                positions.append(state)
+    return positions
+
+@pytest.fixture(scope="module", name="corpus")
+def fixture_corpus() -> list[tuple]:
+    """The positions every benchmark works on."""
+    return random_positions(CORPUS_SIZE, CORPUS_SEED)
+
+def test_table_construction(benchmark):
+    """Import of the gold bot, which loads its lookup tables."""
+    def load():
+        spec = importlib.util.spec_from_file_location("bot_gold_tables", bot_gold.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    module = benchmark.pedantic(load, rounds=5)
+    assert module.HAS_WON == bot_gold.HAS_WON
+
+def test_get_valid_moves(benchmark, corpus):
+    """Move generation on every position of the corpus."""
+    moves = benchmark(lambda: [get_valid_moves(state) for state in corpus])
+    assert all(moves)
+
+def test_next_state(benchmark, corpus):
+    """A seeded move played on every position of the corpus."""
+    rng = Random(CORPUS_SEED)
+    plays = [(state, rng.choice(get_valid_moves(state))) for state in corpus]
+    children = benchmark(lambda: [next_state(state, move) for state, move in plays])
+    assert len(children) == len(plays)
+
+def test_simulate(benchmark, corpus):
+    """Random rollouts to the end of the game from the first positions of the corpus."""
+    results = benchmark.pedantic(lambda: [simulate(state) for state in corpus[:ROLLOUTS]],
+                                 setup=lambda: seed_rng(CORPUS_SEED), rounds=10)
+    assert len(results) == ROLLOUTS
+
+def test_iterations(benchmark, corpus):
+    """Select, expand, simulate and backpropagate: a fixed number of
+    iterations of a new search, the same tree every round.
+
+    """
+    def setup():
+        seed_rng(CORPUS_SEED)
+        return (UltimateBoard.from_state(corpus[0]),), {}
+    def search(board):
+        return board.run(60, iterations=ITERATIONS)
+    assert benchmark.pedantic(search, setup=setup, rounds=10) == ITERATIONS
+    benchmark.extra_info["ns_per_iteration"] = benchmark.stats.stats.min * 1e9 / ITERATIONS \
+        if benchmark.stats else None
+
+def test_run(benchmark, corpus):
+    """Iterations a search of the root gets in RUN_TIME, in extra_info: its
+    time is the budget, test_iterations times the same path.
+
+    """
+    iterations = []
+    def setup():
+        return (UltimateBoard.from_state(corpus[0]),), {}
+    def search(board):
+        iterations.append(board.run(RUN_TIME))
+    benchmark.pedantic(search, setup=setup, rounds=3)
+    benchmark.extra_info["iterations"] = min(iterations)
+    benchmark.extra_info["iterations_per_s"] = min(iterations) / RUN_TIME
+    assert min(iterations) > 0
+
+def test_corpus_fixed(corpus):
+    """The corpus is the same on every run, the baselines compare like for like."""
+    assert corpus == random_positions(CORPUS_SIZE, CORPUS_SEED)
+    assert len(set(corpus)) == CORPUS_SIZE
@@ -1,83 +1,76 @@
-"""Tests fro my new bot classes as they do not work as expected at the moment :)"""
-from ..new_bot import UltimateBoard, get_valid_actions, has_won
-import numpy as np
+"""Tests for my new bot classes as they do not work as expected at the moment :)"""
+from ..new_bot import BIG_TO_SMALL, HAS_WON, SMALL_TO_BIG, VALID_ACTIONS, UltimateBoard
 
 def test_get_valid_actions():
-    """Test get_valid_actions"""
+    """Test the valid actions of a board"""
     #moves when only 1 spot free
-    moves = get_valid_actions(0b011111111)
+    moves = VALID_ACTIONS[0b011111111]
     assert len(moves) == 1
     assert moves[0] & 0b100000000
 
-    moves = get_valid_actions(0b101111111)
+    moves = VALID_ACTIONS[0b101111111]
     assert len(moves) == 1
     assert moves[0] & 0b010000000
 
-    moves = get_valid_actions(0b110111111)
+    moves = VALID_ACTIONS[0b110111111]
     assert len(moves) == 1
     assert moves[0] & 0b001000000
 
-    moves = get_valid_actions(0b111011111)
+    moves = VALID_ACTIONS[0b111011111]
     assert len(moves) == 1
     assert moves[0] & 0b000100000
 
-    moves = get_valid_actions(0b111101111)
+    moves = VALID_ACTIONS[0b111101111]
     assert len(moves) == 1
     assert moves[0] & 0b000010000
 
-    moves = get_valid_actions(0b111110111)
+    moves = VALID_ACTIONS[0b111110111]
     assert len(moves) == 1
     assert moves[0] & 0b000001000
 
-    moves = get_valid_actions(0b111111011)
+    moves = VALID_ACTIONS[0b111111011]
     assert len(moves) == 1
     assert moves[0] & 0b000000100
 
-    moves = get_valid_actions(0b111111101)
+    moves = VALID_ACTIONS[0b111111101]
     assert len(moves) == 1
     assert moves[0] & 0b000000010
 
-    moves = get_valid_actions(0b111111110)
+    moves = VALID_ACTIONS[0b111111110]
     assert len(moves) == 1
     assert moves[0] & 0b000000001
 
     #moves on an empty board
-    moves = get_valid_actions(0b000000000)
+    moves = VALID_ACTIONS[0b000000000]
     assert len(moves) == 9
 
     #few other options
-    moves = get_valid_actions(0b000011111)
+    moves = VALID_ACTIONS[0b000011111]
     assert len(moves) == 4
-    moves = get_valid_actions(0b101010101)
+    moves = VALID_ACTIONS[0b101010101]
     assert len(moves) == 4
-    moves = get_valid_actions(0b010101010)
+    moves = VALID_ACTIONS[0b010101010]
     assert len(moves) == 5
 
 def test_has_won():
-    """Test has_won"""
-    win = has_won(0b001010100)
-    assert win is True
-    
-    loss = has_won(0b101000101)
-    assert loss is False
+    """Test HAS_WON"""
+    assert HAS_WON[0b001010100]
+    assert not HAS_WON[0b101000101]
 
 def test_monte_carlo_play():
-    """Test the play method of the Monte Carlo Node class."""
-
-    #empty board with player_1 moving
-    board = UltimateBoard(False, (0, 0b100000000))
-    
-    board._grid_player_1 = np.array([435, 334,  69, 210, 100, 220, 241, 377, 184])
-    board._grid_player_2 = np.array([ 76, 177, 442, 301, 411, 291, 270, 134, 326])
-
-    board._player_1 = 299
-    board._player_2 = 112
-
-    board._move = (0, 0b100000000)
+    """The moves after a move are on the board its cell points to, or anywhere
+    once that board is full or decided.
 
+    """
+    board = UltimateBoard(True, (0, 0b100000000))
     actions = board.get_valid_actions()
+    assert len(actions) == 8
+    assert {index for index, _ in actions} == {SMALL_TO_BIG[0b100000000]}
+    assert (0, 0b100000000) not in actions
 
-    assert actions == 0
-
-
-
+    # player 2 takes board 0 with its middle row, player 1 is sent there
+    board.grid_player_2[0] = 0b000111000
+    board.player_2 = BIG_TO_SMALL[0]
+    actions = board.get_valid_actions()
+    assert len(actions) == 8 * 9
+    assert all(index != 0 for index, _ in actions)
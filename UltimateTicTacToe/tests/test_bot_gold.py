@@ -0,0 +1,779 @@
+"""Tests for the gold bot search and its lookup tables."""
+from concurrent.futures import Future
+from functools import lru_cache
+import gc
+import json
+import os
+from random import Random
+import time
+
+from .. import bot_gold, generate_boards
+from ..bot_gold import BIG_TO_SMALL, BOARD_MASKS, CELL_BITS, DRAW, HAS_WON, IS_TERMINAL, LOSS, \
+    MACRO_BITS, SMALL_TO_BIG, VALID_ACTIONS, VALID_ACTIONS_LEN, VALID_CELLS, WIN, WINS, Deadline, \
+    EndgameSolver, NodePool, SearchSession, TimeManager, TranspositionTable, WINNING_CELLS, \
+    UltimateBoard, \
+    forced_board, get_valid_moves, next_key, next_state, random_free_move, seed_rng, simulate, \
+    simulate_batch, simulate_heavy, terminal_value, use_opponent_time, zobrist_key
+from ..bot_gold import INVERSE_SYMMETRY, canonical_key, canonical_state, transform_cell, \
+    transform_state, unique_moves
+
+def test_generated_tables_up_to_date():
+    """The embedded tables match a fresh run of generate_boards.py"""
+    tables = generate_boards.render_tables()
+    directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for name in generate_boards.BOT_FILES:
+        with open(os.path.join(directory, name), encoding="utf-8") as file:
+            assert tables in file.read()
+
+def test_tables():
+    """Flat tables give the same lookups as the old dict tables."""
+    for board in range(0b1000000000):
+        assert bool(HAS_WON[board]) == any((win & board) == win for win in WINS)
+        assert VALID_ACTIONS[board] == [move for move in (1 << bit for bit in range(9))
+                                        if not move & board]
+        assert VALID_ACTIONS_LEN[board] == len(VALID_ACTIONS[board])
+        for big in range(9):
+            assert VALID_CELLS[big][board] \
+                == [9 * big + SMALL_TO_BIG[move] for move in VALID_ACTIONS[board]]
+
+    for player_1 in range(0b1000000000):
+        for player_2 in range(0b1000000000):
+            assert IS_TERMINAL[player_1 << 9 | player_2] == (
+                HAS_WON[player_1] or HAS_WON[player_2] or (player_1 | player_2) == 0b111111111
+            )
+
+def reference_game(seed):
+    """Random game on plain grid lists, the way the bots did before packing.
+    Yields the grids, macro boards, valid moves and the chosen move for every turn.
+
+    """
+    rng = Random(seed)
+    grids = [[0] * 9, [0] * 9]
+    macro = [0, 0]
+    player = 0
+    move = None
+    while not IS_TERMINAL[macro[0] << 9 | macro[1]]:
+        moves = []
+        if move is not None:
+            big = move % 9
+            if not IS_TERMINAL[grids[0][big] << 9 | grids[1][big]]:
+                moves = [9 * big + SMALL_TO_BIG[small]
+                         for small in VALID_ACTIONS[grids[0][big] | grids[1][big]]]
+        if not moves:
+            for playable_board in VALID_ACTIONS[macro[0] | macro[1]]:
+                big = SMALL_TO_BIG[playable_board]
+                moves.extend(9 * big + SMALL_TO_BIG[small]
+                             for small in VALID_ACTIONS[grids[0][big] | grids[1][big]])
+        if not moves:
+            return
+        move = rng.choice(moves)
+        yield [grid[:] for grid in grids], macro[:], moves, move
+        big, small = divmod(move, 9)
+        grids[player][big] |= BIG_TO_SMALL[small]
+        if HAS_WON[grids[player][big]]:
+            macro[player] |= BIG_TO_SMALL[big]
+            grids[player][big] = 0b111111111
+            grids[1 - player][big] = 0b000000000
+        player = 1 - player
+
+def test_packed_state():
+    """next_state/get_valid_moves follow the grid list implementation."""
+    for seed in range(200):
+        state = (0, 0, None, False)
+        for grids, macro, moves, move in reference_game(seed):
+            board_1, board_2, _, _ = state
+            for big in range(9):
+                assert board_1 >> 9 * big & 0b111111111 == grids[0][big]
+                assert board_2 >> 9 * big & 0b111111111 == grids[1][big]
+            assert (board_1 >> 81, board_2 >> 81) == tuple(macro)
+            assert get_valid_moves(state) == moves
+            state = next_state(state, move)
+
+def test_simulate():
+    """Random playouts end in a finished game."""
+    state = next_state((0, 0, None, False), 40)
+    for _ in range(100):
+        player_1, player_2, _, played_1, played_2 = simulate(state)
+        assert not played_1 & played_2
+        assert not (played_1 | played_2) & (state[0] | state[1])
+        assert not player_1 & player_2
+        assert IS_TERMINAL[player_1 << 9 | player_2] or VALID_ACTIONS_LEN[player_1 | player_2]
+
+def test_random_free_move():
+    """Sampling by index reaches every valid cell of a free choice exactly once."""
+    for seed in range(50):
+        state = (0, 0, None, False)
+        for _, _, moves, move in reference_game(seed):
+            occupied = state[0] | state[1]
+            forced = 0 if state[2] is None else occupied >> 9 * (state[2] % 9) & 0b111111111
+            if state[2] is None or not VALID_ACTIONS_LEN[forced]:
+                assert [random_free_move(occupied, index) for index in range(len(moves))] \
+                    == moves
+                assert random_free_move(occupied, len(moves)) is None
+                assert random_free_move(occupied) in moves
+            state = next_state(state, move)
+
+    counts = [0] * 81
+    for _ in range(8100):
+        counts[random_free_move(0)] += 1
+    assert min(counts) > 50 and max(counts) < 150
+
+    # few free cells: most samples come from counting the free cells
+    free = [3, 40, 77]
+    occupied = (1 << 81) - 1
+    for cell in free:
+        occupied &= ~next_state((0, 0, None, False), cell)[0]
+    counts = {cell: 0 for cell in free}
+    for _ in range(3000):
+        counts[random_free_move(occupied)] += 1
+    assert min(counts.values()) > 850
+
+    # the boards won are out of the draw: the open boards of the macro bits
+    for open_boards in range(0b1000000000):
+        assert bot_gold.OPEN_BOARDS[open_boards] \
+            == tuple(big for big in range(8, -1, -1) if open_boards & BIG_TO_SMALL[big])
+        assert sorted(bot_gold.OPEN_CELLS[open_boards]) \
+            == [cell for cell in range(81) if open_boards & BIG_TO_SMALL[cell // 9]]
+    occupied = sum(BOARD_MASKS[big] | MACRO_BITS[big] for big in range(8))
+    counts = [0] * 81
+    for _ in range(900):
+        counts[random_free_move(occupied)] += 1
+    assert sum(counts[72:]) == 900 and min(counts[72:]) > 50
+
+def test_zobrist():
+    """Zobrist keys kept up move by move match the keys computed from scratch."""
+    positions = {}
+    for seed in range(100):
+        state = (0, 0, None, False)
+        key = zobrist_key(state)
+        for _, _, _, move in reference_game(seed):
+            child = next_state(state, move)
+            key = next_key(key, state, child)
+            assert key == zobrist_key(child)
+            assert 0 <= key < 1 << 64
+            # no two positions share a key
+            position = (child[0], child[1], child[3], forced_board(child))
+            assert positions.setdefault(key, position) == position
+            state = child
+
+def test_simulate_heavy():
+    """Heavy playouts take a board they can win at once."""
+    for own in range(0b1000000000):
+        assert WINNING_CELLS[own] == sum(1 << bit for bit in range(9)
+                                         if not own >> bit & 1 and HAS_WON[own | 1 << bit])
+
+    def cells(*moves):
+        return sum(next_state((0, 0, None, False), move)[0] for move in moves)
+    # player 1 to move on the top left board, with two cells of its top row
+    state = (cells(0, 1), cells(9, 18), 18, False)
+    assert all(simulate_heavy(state)[0] & BIG_TO_SMALL[0] for _ in range(100))
+    assert not all(simulate(state)[0] & BIG_TO_SMALL[0] for _ in range(100))
+
+    board = UltimateBoard(True, 40, heavy=True)
+    board.run(.05)
+    check_tree(board.pool, board.root)
+
+def check_tree(pool, node):
+    """Children of visited nodes hold the state their move leads to."""
+    first = pool.first_child[node]
+    if first < 0:
+        return
+    for child in range(first, first + pool.child_count[node]):
+        assert pool.parents[child] == node
+        if child < first + pool.expanded[node]:
+            assert pool.states[child] == next_state(pool.states[node], pool.moves[child])
+            key = zobrist_key if pool.table is None else canonical_key
+            assert pool.keys[child] == key(pool.states[child])
+            check_tree(pool, child)
+        else:
+            assert pool.states[child] is None
+            assert pool.visits[child] == 0
+
+def test_node_pool():
+    """Search on the node pool keeps a consistent tree and moves its root."""
+    board = UltimateBoard(True, 40)
+    board.run(.05)
+    check_tree(board.pool, board.root)
+    assert sorted(board.pool.moves[child] for child in range(
+        board.pool.first_child[board.root],
+        board.pool.first_child[board.root] + board.pool.child_count[board.root]
+    )) == sorted(board.get_valid_actions())
+
+    move = board.get_valid_actions()[-1]
+    board.advance_root(move)
+    assert board.move == move
+    check_tree(board.pool, board.root)
+    board.run(.01)
+    check_tree(board.pool, board.root)
+
+def test_node_pool_full():
+    """A full pool stops growing the tree but the search goes on."""
+    board = UltimateBoard(True, 40, NodePool(100))
+    assert board.run(.02) > 0
+    assert board.pool.size <= 100
+    check_tree(board.pool, board.root)
+
+
+def test_tiny_pool(monkeypatch):
+    """The empty board may be played anywhere: its rollouts and a search in a
+    pool too small for the tree of its moves still choose valid moves.
+
+    """
+    start = (0, 0, None, False)
+    for rollout in (simulate, simulate_heavy):
+        player_1, player_2, _, _, _ = rollout(start)
+        assert IS_TERMINAL[player_1 << 9 | player_2] or VALID_ACTIONS_LEN[player_1 | player_2]
+    for book in (bot_gold.OPENING_BOOK, {}):
+        monkeypatch.setattr(bot_gold, "OPENING_BOOK", book)
+        for capacity in (5, 20, 50):
+            board = UltimateBoard.from_state(start, NodePool(capacity))
+            board.run(.01)
+            board = UltimateBoard.from_state(start, NodePool(capacity))
+            move = board.choose_move(.01)
+            assert move in get_valid_moves(start)
+            assert board.state == next_state(start, move)
+            assert board.choose_move(.01) in get_valid_moves(next_state(start, move))
+
+def subtree_stats(pool, node, path=()):
+    """Map the move path of every visited node below node to its statistics."""
+    stats = {path: (pool.visits[node], pool.scores[node], pool.states[node])}
+    first = pool.first_child[node]
+    if first >= 0:
+        for child in range(first, first + pool.expanded[node]):
+            stats.update(subtree_stats(pool, child, path + (pool.moves[child],)))
+    return stats
+
+def test_advance_root():
+    """Advancing the root keeps the subtree statistics and frees the rest."""
+    board = UltimateBoard(True, 40)
+    board.run(.05)
+    child = board.best_child
+    move = board.pool.moves[child]
+    expected = subtree_stats(board.pool, child)
+
+    assert board.advance_root(move, compact=False) == board.pool.size
+    assert board.root == child
+    retained = board.advance_root(board.pool.moves[board.best_child])
+    assert board.root == 0
+    assert retained == board.pool.size
+    assert all(state is None for state in board.pool.states[retained:])
+    check_tree(board.pool, board.root)
+    grandchild = {path[1:]: stats for path, stats in expected.items()
+                  if path and path[0] == board.move}
+    assert subtree_stats(board.pool, board.root) == grandchild
+    board.run(.01)
+    check_tree(board.pool, board.root)
+
+def test_search_session(capsys):
+    """The collector is off during the search and the turn gets logged."""
+    session = SearchSession()
+    board = UltimateBoard(True, 40)
+    try:
+        with session:
+            assert not gc.isenabled()
+            board.run(.01)
+        assert session.search_pauses == 0
+        session.collect()
+        assert capsys.readouterr().err.splitlines()[-1].startswith("gc allocated")
+    finally:
+        gc.callbacks.remove(session._on_gc)
+        gc.enable()
+
+def test_deadline():
+    """The search stops on time and reads the clock far less than once per iteration."""
+    deadline = Deadline(0)
+    assert deadline.check() == 0
+
+    deadline = Deadline(.05)
+    strides = 0
+    while True:
+        stride = deadline.check()
+        if not stride:
+            break
+        strides += stride
+        time.sleep(.0001 * stride)
+    assert deadline.remaining() == 0
+    assert deadline.checks < strides
+
+    board = UltimateBoard(True, 40)
+    begin = time.perf_counter()
+    board.run(.05)
+    assert time.perf_counter() - begin < .06
+
+def test_time_manager(capsys):
+    """The search time leaves the margin and the overrun of the last turns out."""
+    clock = TimeManager()
+    clock.start(.02, .005)
+    assert .01 < clock.search_time() <= .015
+    time.sleep(.025)
+    assert clock.stop() >= .025
+    assert capsys.readouterr().err.startswith("latency")
+    assert clock.overruns[-1] >= 10_000_000
+
+    clock.start(.02, .005)
+    assert clock.search_time() < .005
+    clock.start(1, .05, time.perf_counter_ns() - 2_000_000_000)
+    assert clock.search_time() == 0
+    clock.stop()
+    assert len(clock.latencies) == 2
+    assert clock.answered <= time.perf_counter_ns()
+
+    # a look at stdin that finds nothing is the earliest a later line can have arrived
+    begin = time.perf_counter_ns()
+    assert not bot_gold.input_waiting()
+    assert begin <= bot_gold.INPUT_IDLE_NS <= time.perf_counter_ns()
+
+def test_settled():
+    """The search stops early once the best move is decided, or on a stable root."""
+    board = UltimateBoard(True, 40)
+    board.run(.05)
+    pool = board.pool
+    first = pool.first_child[board.root]
+    children = sorted((pool.shared[child] for child in range(first, first + pool.expanded[0])),
+                      key=lambda child: pool.visits[child], reverse=True)
+    best, second = children[:2]
+    stable = pool.scores[best] / pool.visits[best] >= pool.scores[second] / pool.visits[second]
+    assert not board.settled(Deadline(100), time.perf_counter_ns() + 100_000_000_000)
+    assert board.settled(Deadline(100), 0) == stable
+    assert board.settled(Deadline(0), time.perf_counter_ns() + 100_000_000_000)
+
+    # a single move is played without searching
+    rng = Random(2)
+    state = (0, 0, None, False)
+    while len(get_valid_moves(state)) != 1:
+        moves = get_valid_moves(state)
+        state = next_state(state, rng.choice(moves)) \
+            if moves and not IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81] \
+            else (0, 0, None, False)
+    board = UltimateBoard.from_state(state)
+    begin = time.perf_counter()
+    assert board.choose_move(1) == get_valid_moves(state)[0]
+    assert time.perf_counter() - begin < .1
+
+def test_ponder(monkeypatch):
+    """Pondering searches every reply until the opponent's move arrives, and
+    the next turn keeps the subtree of that move.
+
+    """
+    board = UltimateBoard.from_state((0, 0, None, False))
+    board.choose_move(.02)
+    board.compact()
+    checks = iter(range(-20, 1_000_000))
+    monkeypatch.setattr(bot_gold, "input_waiting", lambda: next(checks) >= 0)
+    begin = time.perf_counter()
+    assert board.ponder(5) > 0
+    assert time.perf_counter() - begin < 1
+    assert board.pool.expanded[board.root] == board.pool.child_count[board.root] \
+        == len(board.get_valid_actions())
+    moves, visits, _ = board.root_statistics()
+    reply = moves[visits.index(max(visits))]
+    board.advance_root(reply, compact=False)
+    assert board.pool.visits[board.root] == max(visits) > 1
+    check_tree(board.pool, board.root)
+
+def test_ponder_endgame(monkeypatch):
+    """Pondering a late position stops the endgame solver as soon as the
+    opponent's move arrives, as it stops the search.
+
+    """
+    monkeypatch.setattr(bot_gold, "input_waiting", lambda: True)
+    for state in late_positions(Random(6), 5, bot_gold.ENDGAME_CELLS):
+        board = UltimateBoard.from_state(state, endgame=bot_gold.ENDGAME_CELLS)
+        begin = time.perf_counter()
+        board.ponder(5)
+        assert time.perf_counter() - begin < .05
+        check_tree(board.pool, board.root)
+
+def test_use_opponent_time(monkeypatch, capsys):
+    """The tree is compacted, the garbage collected and the opponent's move
+    pondered after our move, unless the opponent already answered.
+
+    """
+    pondered = []
+    monkeypatch.setattr(UltimateBoard, "ponder", lambda board: pondered.append(board.root))
+    session = SearchSession()
+    for waiting in (True, False):
+        monkeypatch.setattr(bot_gold, "input_waiting", lambda: waiting)
+        board = UltimateBoard.from_state((0, 0, None, False))
+        board.choose_move(.02)
+        size = board.pool.size
+        use_opponent_time(board, session)
+        assert (board.pool.size == size) is waiting
+        assert (board.root == 0) is not waiting
+        assert ("gc allocated" in capsys.readouterr().err) is not waiting
+        assert (pondered == [0]) is not waiting
+        pondered.clear()
+        check_tree(board.pool, board.root)
+
+def test_telemetry(monkeypatch, capsys):
+    """The search logs one line of telemetry before its iteration count."""
+    board = UltimateBoard(True, 40)
+    board.run(.02)
+    assert len(capsys.readouterr().err.splitlines()) == 1
+
+    monkeypatch.setattr(bot_gold, "TELEMETRY", True)
+    monkeypatch.setattr(bot_gold, "TELEMETRY_FORMAT", "json")
+    count = board.run(.05)
+    line, last = capsys.readouterr().err.splitlines()
+    report = json.loads(line)
+    assert report["label"] == "search"
+    assert report["iterations"] == count == int(last)
+    assert report["reused"] > 0
+    assert report["allocated"] > 0
+    assert 0 < report["depth_mean"] <= report["depth_max"]
+    assert sum(visits for visits, _ in report["visits"]) == report["reused"] + count
+    times = report["ms"]
+    assert min(times.values()) >= 0
+    assert sum(times.values()) - times["wall"] <= times["wall"]
+
+    monkeypatch.setattr(bot_gold, "TELEMETRY_FORMAT", "text")
+    board.run(.01)
+    assert capsys.readouterr().err.startswith("search ")
+
+def test_simulate_batch():
+    """Lockstep rollouts finish every game and win as often as scalar ones,
+    from the empty board as well.
+
+    """
+    for state in (next_state((0, 0, None, False), 40), (0, 0, None, False)):
+        player_1, player_2 = simulate_batch(state, 2000)
+        assert len(player_1) == len(player_2) == 2000
+        wins = 0
+        for macro_1, macro_2 in zip(player_1.tolist(), player_2.tolist()):
+            assert not macro_1 & macro_2
+            wins += HAS_WON[macro_1]
+        scalar_wins = sum(HAS_WON[simulate(state)[0]] for _ in range(2000))
+        assert abs(wins - scalar_wins) < 150
+
+    board = UltimateBoard(True, 40, batch=32)
+    board.run(.05)
+    check_tree(board.pool, board.root)
+    assert board.pool.visits[board.best_child] > 32
+
+def test_run_parallel():
+    """Root parallel search merges the root child statistics of every worker."""
+    board = UltimateBoard(True, 40)
+    count = board.run_parallel(.05, 3)
+    check_tree(board.pool, board.root)
+    moves, visits, _ = board.root_statistics()
+    assert sorted(moves) == sorted(set(moves))
+    # every child starts with one visit, then gets one per iteration through it
+    assert sum(visits) - len(visits) == count
+
+def test_run_parallel_options():
+    """The workers search with the transposition table, RAVE and endgame
+    solver of the parent.
+
+    """
+    executor = InlineExecutor()
+    board = UltimateBoard.from_state(next_state((0, 0, None, False), 40),
+                                     NodePool(1 << 16, 1 << 10, True), endgame=20)
+    count = board.run_parallel(.02, 3, executor)
+    transpositions = board.pool.table.capacity
+    assert [args[5:8] for args in executor.calls] == [(transpositions, True, 20)] * 2
+    _, visits, _ = board.root_statistics()
+    assert sum(visits) - len(visits) == count
+
+class InlineExecutor():
+    """Executor running the workers of run_parallel in this process, recording
+    their arguments.
+
+    """
+    def __init__(self) -> None:
+        self.calls = []
+
+    def submit(self, function, *args) -> Future:
+        """Run function at once, its result in a done future."""
+        self.calls.append(args)
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+def test_seed_rng():
+    """A seeded search of a fixed number of iterations grows the same tree
+    every time, with scalar and with batched rollouts. The workers of a seeded
+    root parallel search get seeds of their own, the same every time.
+
+    """
+    def search(value, batch=0):
+        seed_rng(value)
+        board = UltimateBoard(True, 40, batch=batch)
+        assert board.run(60, iterations=300) == 300
+        return board.root_statistics(), board.pool.moves[:board.pool.size]
+    try:
+        assert search(7) == search(7)
+        assert search(7) != search(8)
+        assert search(7, 8) == search(7, 8)
+
+        executor = InlineExecutor()
+        for value in (7, 7, None):
+            seed_rng(value)
+            UltimateBoard(True, 40).run_parallel(.01, 3, executor)
+        assert [args[-1] for args in executor.calls] == [8, 9, 8, 9, None, None]
+    finally:
+        seed_rng()
+
+def test_search_perspective():
+    """The search of a position and of its twin with the colors swapped plays
+    the same rollouts, so its statistics are the same: every node scores for
+    the player who made its move, whoever made the root move.
+
+    """
+    rng = Random(3)
+    state = (0, 0, None, False)
+    for _ in range(15):
+        state = next_state(state, rng.choice(get_valid_moves(state)))
+    board_1, board_2, move, is_player_1 = state
+    twin = (board_2, board_1, move, not is_player_1)
+    def search(root, batch=0, rave=False):
+        seed_rng(11)
+        board = UltimateBoard.from_state(root, NodePool(rave=rave), batch)
+        board.run(60, iterations=300)
+        pool = board.pool
+        amaf = (pool.amaf_visits[:pool.size], pool.amaf_scores[:pool.size]) if rave else None
+        return board.root_statistics(), pool.moves[:pool.size], amaf
+    try:
+        for batch, rave in ((0, False), (8, False), (0, True)):
+            statistics = search(state, batch, rave)
+            assert statistics == search(twin, batch, rave)
+            _, visits, scores = statistics[0]
+            assert sum(visits) - len(visits) == 300 * (batch or 1)
+            assert 0 < sum(scores) < sum(visits)
+    finally:
+        seed_rng()
+
+def test_always_winning(monkeypatch):
+    """When every rollout ends in a win of player 1, the moves of player 1
+    score every rollout through them and the moves of player 2 none, whoever
+    made the root move.
+
+    """
+    monkeypatch.setattr(bot_gold, "simulate", lambda state: (0b111000000, 0, True, 0, 0))
+    for root in ((0, 0, None, False), next_state((0, 0, None, False), 40)):
+        board = UltimateBoard.from_state(root)
+        board.run(60, iterations=200)
+        pool = board.pool
+        for node in range(pool.size):
+            if node != board.root and pool.visits[node]:
+                # a node starts with one visit, before its first rollout
+                expected = pool.visits[node] - 1 if pool.states[node][3] else 0
+                assert pool.scores[node] == expected
+
+def test_transpositions():
+    """Move orders reaching the same position share one node of the search DAG."""
+    def play(moves):
+        state = (0, 0, None, False)
+        for move in moves:
+            state = next_state(state, move)
+        return state
+    # the same four cells, the two pairs of moves swapped
+    assert zobrist_key(play([36, 4, 44, 76])) == zobrist_key(play([44, 76, 36, 4]))
+    assert zobrist_key(play([36, 4, 44, 76])) != zobrist_key(play([36, 4, 44, 78]))
+
+    def descend(pool, node, moves):
+        for move in moves:
+            if pool.first_child[node] < 0:
+                pool.expand(node)
+            first = pool.first_child[node]
+            child = next(child for child in range(first, first + pool.child_count[node])
+                         if pool.moves[child] == move)
+            if child >= first + pool.expanded[node]:
+                child = pool.visit(node, child)
+            node = pool.shared[child]
+        return child
+
+    board = UltimateBoard.from_state(play([36, 4]), NodePool(1 << 16, 1 << 12))
+    pool = board.pool
+    node = descend(pool, board.root, [44, 76, 38, 22])
+    linked = descend(pool, board.root, [38, 22, 44, 76])
+    assert pool.links == [linked]
+    assert pool.shared[linked] == node
+
+    # searching below the parent of the linked node backs up through the link
+    board.root = pool.parents[linked]
+    # the telemetry counts the depth along the path through the link, the
+    # node of the position is four moves below the first root
+    stats = bot_gold.SearchStats(board)
+    stats.start()
+    stats.leaf(node, 1, [linked])
+    assert stats.depth_max == 1
+    count = board.run(.05)
+    check_tree(pool, board.root)
+    _, visits, _ = board.root_statistics()
+    assert sum(visits) - len(visits) == count
+    for node in pool.links:
+        assert pool.first_child[node] < 0
+        assert pool.shared[pool.shared[node]] == pool.shared[node]
+        assert canonical_key(pool.states[node]) == canonical_key(pool.states[pool.shared[node]])
+
+    board.advance_root(board.pool.moves[board.best_child])
+    assert not pool.links
+    assert list(pool.shared[:pool.size]) == list(range(pool.size))
+    check_tree(pool, board.root)
+    board.run(.02)
+    check_tree(pool, board.root)
+
+    # without compaction as well, nothing leads out of the subtree of the new root
+    board.advance_root(board.pool.moves[board.best_child], compact=False)
+    assert board.root == 0
+    assert all(pool.shared[node] < pool.size for node in pool.links)
+    assert all(node < pool.size for node in pool.table.nodes)
+    board.run(.02)
+    check_tree(pool, board.root)
+
+def test_transposition_table_bounded():
+    """A full table replaces the entry with the fewest visits of the bucket."""
+    table = TranspositionTable(4)
+    visits = [5, 1, 3]
+    assert table.capacity == 4
+    keys = [key * table.buckets for key in range(3)]
+    assert [table.lookup(key, node, visits) for node, key in enumerate(keys)] == [0, 1, 2]
+    assert table.replaced == 1
+    assert table.lookup(keys[0], 3, visits) == 0
+    assert table.lookup(keys[1], 3, visits) == 3
+
+def test_rave():
+    """Every iteration through a child counts its move as played, in the AMAF statistics too."""
+    board = UltimateBoard(True, 40, NodePool(1 << 16, rave=True))
+    board.run(.05)
+    check_tree(board.pool, board.root)
+    pool = board.pool
+    first = pool.first_child[board.root]
+    for child in range(first, first + pool.expanded[board.root]):
+        assert pool.amaf_visits[child] >= pool.visits[child] - 1
+        assert 0 <= pool.amaf_scores[child] <= pool.amaf_visits[child]
+
+    board.advance_root(pool.moves[board.best_child])
+    check_tree(pool, board.root)
+    board.run(.02)
+    check_tree(pool, board.root)
+    assert UltimateBoard(True, 40).pool.amaf_visits is None
+
+@lru_cache(maxsize=None)
+def negamax(state):
+    """Exact value of state for the player who made its last move."""
+    if IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81] or not get_valid_moves(state):
+        return terminal_value(state)
+    values = [negamax(next_state(state, move)) for move in get_valid_moves(state)]
+    return WIN + LOSS - max(values)
+
+def test_solver():
+    """Decided positions are proven like an exact search and end the search early."""
+    # player 1 holds the top left and top middle boards, and two cells of the
+    # top right one which player 2 sent them to
+    board_1 = BOARD_MASKS[0] | MACRO_BITS[0] | BOARD_MASKS[1] | MACRO_BITS[1] \
+        | CELL_BITS[18] | CELL_BITS[19]
+    board_2 = CELL_BITS[29] | CELL_BITS[36] | CELL_BITS[40] | CELL_BITS[44]
+    board = UltimateBoard.from_state((board_1, board_2, 29, False))
+    begin = time.perf_counter()
+    board.run(1)
+    assert time.perf_counter() - begin < .5
+    assert board.pool.proven[board.root] == LOSS
+    assert board.pool.moves[board.best_child] == 20
+
+    for state in late_positions(Random(3), 5, 10):
+        board = UltimateBoard.from_state(state, NodePool(1 << 16))
+        board.run(2)
+        assert board.pool.proven[board.root] == negamax(state)
+        check_tree(board.pool, board.root)
+
+def late_positions(rng, count, cells):
+    """Positions of random games, at most cells empty cells before their end."""
+    positions = []
+    while len(positions) < count:
+        state = (0, 0, None, False)
+        while not (IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81]
+                   or not get_valid_moves(state)):
+            if (~(state[0] | state[1]) & (1 << 81) - 1).bit_count() <= cells:
+                positions.append(state)
+                break
+            state = next_state(state, rng.choice(get_valid_moves(state)))
+    return positions
+
+def test_endgame_solver():
+    """The endgame solver agrees with an exact search, and the search goes on
+    when it runs out of time.
+
+    """
+    solver = EndgameSolver()
+    for state in late_positions(Random(4), 5, 14):
+        end = time.perf_counter_ns() + 10_000_000_000
+        solver.end = end
+        # the value is for the player to move
+        assert solver.search(state, zobrist_key(state), -1, 1) == DRAW - negamax(state)
+        solver.end = end
+        assert solver.search(state, zobrist_key(state), -1, 1) == DRAW - negamax(state)
+
+        board = UltimateBoard.from_state(state, endgame=81)
+        assert board.run(2) == 0
+        pool = board.pool
+        first = pool.first_child[board.root]
+        children = range(first, first + pool.child_count[board.root])
+        assert pool.proven[board.root] == negamax(state)
+        assert pool.proven[board.best_child] == max(pool.proven[child] for child in children)
+
+    state = UltimateBoard(True, 40).state
+    board = UltimateBoard.from_state(state, endgame=81)
+    assert board.run(.05) > 0
+    assert not board.pool.proven[board.root]
+    check_tree(board.pool, board.root)
+
+def test_book_move(monkeypatch):
+    """A book move is played at once, and the next move is searched as usual."""
+    start = (0, 0, None, False)
+    monkeypatch.setattr(bot_gold, "OPENING_BOOK", {zobrist_key(start): 40})
+    board = UltimateBoard.from_state(start)
+    assert board.book_move() == 40
+    assert board.choose_move(.02) == 40
+    assert board.move == 40
+    assert board.pool.first_child[board.root] < 0
+    assert board.book_move() is None
+    move = board.choose_move(.02)
+    assert board.move == move
+    assert board.compact() == board.pool.size
+    check_tree(board.pool, board.root)
+
+    # a move the position does not have is not played
+    monkeypatch.setattr(bot_gold, "OPENING_BOOK", {canonical_key(board.state): 40})
+    assert board.book_move() is None
+
+def test_symmetry():
+    """Symmetries commute with the moves, and symmetric positions share one key."""
+    rng = Random(5)
+    state = (0, 0, None, False)
+    while get_valid_moves(state) and not IS_TERMINAL[(state[0] >> 81) << 9 | state[1] >> 81]:
+        key = canonical_key(state)
+        move = rng.choice(get_valid_moves(state))
+        for symmetry in range(8):
+            image = transform_state(state, symmetry)
+            assert transform_state(image, INVERSE_SYMMETRY[symmetry]) == state
+            assert canonical_key(image) == key
+            assert sorted(get_valid_moves(image)) \
+                == sorted(transform_cell(cell, symmetry) for cell in get_valid_moves(state))
+            assert transform_state(next_state(state, move), symmetry) \
+                == next_state(image, transform_cell(move, symmetry))
+        position, symmetry = canonical_state(state)
+        assert transform_state(state, symmetry) == position
+        state = next_state(state, move)
+
+    # the empty board has 15 different first moves, the center board after the
+    # center cell a corner and an edge, board 0 after a corner 6 cells off the diagonal
+    start = (0, 0, None, False)
+    assert len(unique_moves(start)) == 15
+    assert len(unique_moves(next_state(start, 40))) == 2
+    assert len(unique_moves(next_state(start, 36))) == 6
+
+def test_expand_root():
+    """Symmetric moves are searched once at the root, and a move the root left
+    out starts a new tree.
+
+    """
+    board = UltimateBoard.from_state((0, 0, None, False))
+    board.expand_root()
+    assert board.pool.child_count[board.root] == 15
+    board.run(.02)
+    check_tree(board.pool, board.root)
+    moves = set(board.pool.moves[board.pool.first_child[0]:board.pool.first_child[0] + 15])
+    move = next(move for move in board.get_valid_actions() if move not in moves)
+    assert board.advance_root(move) == 1
+    assert board.move == move
@@ -0,0 +1,31 @@
+"""Tests for the offline opening book generation."""
+from ..bot_gold import INVERSE_SYMMETRY, canonical_state, get_valid_moves, next_state, \
+    read_book, transform_cell, zobrist_key
+from ..generate_book import generate, render_book
+
+def test_generate():
+    """The book answers the empty board, every first move and every reply to
+    the first book move, with one entry for symmetric positions.
+
+    """
+    book = generate(3, .005, 1, 1 << 12)
+    start = (0, 0, None, False)
+    first = next_state(start, book[zobrist_key(start)])
+    positions = [start] + [next_state(start, move) for move in get_valid_moves(start)] \
+        + [next_state(first, move) for move in get_valid_moves(first)]
+    keys = set()
+    for state in positions:
+        position, symmetry = canonical_state(state)
+        keys.add(zobrist_key(position))
+        move = transform_cell(book[zobrist_key(position)], INVERSE_SYMMETRY[symmetry])
+        assert move in get_valid_moves(state)
+    assert len(book) == len(keys) < len(positions)
+
+def test_render_book():
+    """The rendered book reads back the same."""
+    book = {0: 40, 0xfedcba9876543210: 0, 12345: 80}
+    namespace = {}
+    exec(render_book(book, 2, 3), namespace)
+    assert read_book(namespace["BOOK_DIGITS"]) == book
+    exec(render_book({}, 2, 3), namespace)
+    assert read_book(namespace["BOOK_DIGITS"]) == {}
@@ -0,0 +1,30 @@
+"""Tests for the profiling harness."""
+import os
+
+from ..bot_gold import get_valid_moves, next_state
+from ..profiler import PHASES, compare, profile_game, read_report, save_reports
+
+def test_profile_game(tmp_path):
+    """A seeded game is profiled phase by phase, and two runs compare."""
+    referee, sampler, log = profile_game("bot_gold", [40], 0, 2, True, 1)
+    assert referee.turn == 2
+    assert referee.moves[0] == 40
+    state = (0, 0, None, False)
+    for move in referee.moves:
+        assert move in get_valid_moves(state)
+        state = next_state(state, move)
+    assert "latency" in log
+    assert all(sum(samples.values()) for samples in sampler.samples.values())
+
+    output = str(tmp_path / "stats")
+    save_reports(output, referee, sampler, log)
+    save_reports(output, referee, None, log)
+    assert set(os.listdir(output)) == {"game.txt", "log.txt", *(f"{phase}.txt" for phase in PHASES)}
+    assert len(os.listdir(output + "_prev")) == 2 + 2 * len(PHASES)
+    total, functions = read_report(os.path.join(output, "turns.txt"))
+    assert total > 0
+    assert any("(run)" in name for name in functions)
+    report = compare(output + "_prev", output)
+    assert [line.split(":")[0] for line in report.splitlines() if not line.startswith(" ")] \
+        == list(PHASES)
+    assert "+0.000 s" in report